@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe least-recently-used cache with an optional TTL.
+    A maxsize of 0 disables caching; a ttl of 0 keeps entries until evicted.
+
+    A value loaded before an invalidate() can arrive after it. To keep such
+    a value out, take generation(key) before loading and pass it to put(),
+    which then does nothing if the key was invalidated or the cache cleared
+    in between.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}  # key -> times invalidated, for at most maxsize keys
+        self._epoch = 0  # Times cleared
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key):
+        """A token for put(), identifying the current state of `key`."""
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def put(self, key, value, generation=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return  # Invalidated since the value was loaded
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._generations) >= max(self.maxsize, 1):
+                # Forget them rather than grow without bound; the new epoch
+                # turns every put still holding an old generation into a no-op
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
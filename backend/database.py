@@ -1,7 +1,8 @@
 import sqlalchemy
 from databases import Database
+from decouple import config
 
-DATABASE_URL = "sqlite:///./secure_qr_mvp.db"
+DATABASE_URL = config("DATABASE_URL", default="sqlite:///./secure_qr_mvp.db")
 
 database = Database(DATABASE_URL)
 metadata = sqlalchemy.MetaData()
@@ -17,9 +18,41 @@ products = sqlalchemy.Table(
     sqlalchemy.Column("creation_date", sqlalchemy.DateTime, default=sqlalchemy.func.now()),
     # --- PHASE 2 ADDITION ---
     sqlalchemy.Column("master_pattern_path", sqlalchemy.String),
+    # --- KEYED PATTERNS ---
+    # "file", "keyed" or "packed", see backend/patterns.py. NULL on rows
+    # created before this column existed, which are all file-backed.
+    sqlalchemy.Column("pattern_mode", sqlalchemy.String),
+)
+
+# --- SCAN LOG ---
+# One row per verification, written in batches by backend/scan_log.py.
+# image_hash is the SHA-256 of the uploaded bytes; many distinct images of one
+# unique_id suggest the code has been cloned.
+scans = sqlalchemy.Table(
+    "scans",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("unique_id", sqlalchemy.String, index=True),  # NULL if no QR code was read
+    sqlalchemy.Column("image_hash", sqlalchemy.String),
+    sqlalchemy.Column("status", sqlalchemy.String),
+    sqlalchemy.Column("similarity_score", sqlalchemy.Float),
+    sqlalchemy.Column("scanned_at", sqlalchemy.DateTime, index=True),
 )
 
 engine = sqlalchemy.create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
 )
-metadata.create_all(engine) # This will safely add the new column
\ No newline at end of file
+metadata.create_all(engine)
+
+
+def add_missing_columns():
+    """create_all only creates missing tables, so add any newer columns by hand."""
+    existing = {column["name"] for column in sqlalchemy.inspect(engine).get_columns("products")}
+    with engine.begin() as connection:
+        for column in products.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(sqlalchemy.text(f"ALTER TABLE products ADD COLUMN {column.name} {column_type}"))
+
+
+add_missing_columns()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import functools
+import time
+from typing import NamedTuple, Optional, Tuple
+import cv2
+import numpy as np
+import qrcode
+from pyzbar.pyzbar import ZBarSymbol, decode
+from .patterns import PATTERN_SIZE
+
+# Everything in this module is CPU-bound and free of shared state, so it can
+# run inline, in a thread pool or in worker processes (see backend/workers.py).
+
+# --- IMAGE PIPELINE ---
+ZBAR_MAX_SIDE = 1024  # QR detection runs on a copy downscaled to this size
+# How the generator lays out labels; must match generator/qr_render.py
+LABEL_QR_VERSION = 3
+LABEL_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_H
+LABEL_BOX_SIZE = 10
+# Which way the symbol's top edge (top-left to top-right) points on screen,
+# for each orientation zbar can report it was read in
+TOP_EDGE_DIRECTIONS = {"UP": (1, 0), "RIGHT": (0, 1), "DOWN": (-1, 0), "LEFT": (0, -1)}
+
+class QRDecodeError(Exception):
+    """The uploaded image could not be read or contains no QR code."""
+
+
+class ImageAnalysis(NamedTuple):
+    unique_id: str
+    pattern: Optional[np.ndarray]  # The extracted security pattern
+    pattern_error: Optional[str]  # Why the pattern could not be extracted
+    timings: Tuple[Tuple[str, float], ...] = ()  # (stage, seconds), reported in Server-Timing
+
+
+def decode_grayscale(image_data: bytes) -> np.ndarray:
+    """Decodes an uploaded image, once, straight into a grayscale buffer."""
+    if not image_data:
+        raise QRDecodeError("Could not process image: the upload is empty.")
+    try:
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    except cv2.error:
+        image = None
+    if image is None:
+        raise QRDecodeError("Could not process image: unsupported or corrupt image data.")
+    return image
+
+
+def find_qr_code(image: np.ndarray):
+    """
+    Locates and decodes the QR code on a downscaled copy of `image`, falling
+    back to full resolution for codes too small to survive the downscale.
+    Returns the decoded symbol and its polygon in full-resolution coordinates.
+    """
+    scale = ZBAR_MAX_SIDE / max(image.shape)
+    if scale < 1:
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        decoded_objects = decode(small, symbols=[ZBarSymbol.QRCODE])
+        if decoded_objects:
+            symbol = decoded_objects[0]
+            return symbol, np.array(symbol.polygon, dtype=np.float32) / scale
+
+    decoded_objects = decode(image, symbols=[ZBarSymbol.QRCODE])
+    if not decoded_objects:
+        raise QRDecodeError("No QR code found in the image.")
+    symbol = decoded_objects[0]
+    return symbol, np.array(symbol.polygon, dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def _symbol_size(mode: int, length: int) -> int:
+    qr = qrcode.QRCode(version=LABEL_QR_VERSION, error_correction=LABEL_ERROR_CORRECTION)
+    qr.add_data(qrcode.util.QRData(b"0" * length, mode=mode))
+    qr.best_fit(start=LABEL_QR_VERSION)  # The generator fits from QR_VERSION up, never below
+    return (qr.version * 4 + 17) * LABEL_BOX_SIZE
+
+
+def symbol_size(unique_id: str) -> int:
+    """Side, in label pixels, of the QR symbol the generator draws for `unique_id`."""
+    data = qrcode.util.QRData(unique_id)
+    return _symbol_size(data.mode, len(data))
+
+
+def order_corners(polygon: np.ndarray, orientation: Optional[str] = None) -> np.ndarray:
+    """
+    Reduces a symbol polygon to the symbol's own top-left, top-right,
+    bottom-right and bottom-left corners, however it is turned in the image.
+    zbar's polygon is a convex hull whose order says nothing about rotation,
+    so the top edge is taken to be the one pointing closest to the way
+    `orientation` says the symbol reads (upright if unknown).
+    """
+    if len(polygon) != 4:
+        polygon = cv2.boxPoints(cv2.minAreaRect(polygon))
+    centre = polygon.mean(axis=0)
+    angles = np.arctan2(polygon[:, 1] - centre[1], polygon[:, 0] - centre[0])
+    polygon = polygon[np.argsort(angles)]  # Clockwise on screen
+    edges = np.roll(polygon, -1, axis=0) - polygon  # Edge i runs from corner i to corner i + 1
+    top = int(np.argmax(edges @ np.float32(TOP_EDGE_DIRECTIONS.get(orientation, (1, 0)))))
+    return np.roll(polygon, -top, axis=0).astype(np.float32)
+
+
+def symbol_corners(image: np.ndarray, polygon: np.ndarray, side: int, orientation: Optional[str] = None) -> np.ndarray:
+    """
+    Refines the decoder's symbol corners to sub-pixel accuracy on the
+    full-resolution image. Returns them in coordinates where pixel i spans
+    [i, i + 1], which is what the rectification below works in.
+    """
+    corners = order_corners(polygon, orientation)
+    module = np.linalg.norm(corners[1] - corners[0]) * LABEL_BOX_SIZE / side
+    window = int(np.clip(module * 0.8, 2, 15))  # Stay clear of the finder pattern's inner edges
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.01)
+    refined = cv2.cornerSubPix(image, corners[:, None].copy(), (window, window), (-1, -1), criteria)[:, 0]
+
+    if np.all(np.linalg.norm(refined - corners, axis=1) <= module):
+        # cornerSubPix lands on the corner itself, between pixel centres
+        return refined + 0.5
+    # The decoder reports the centres of the corner pixels; step out half a pixel
+    return corners + 0.5 + 0.5 * np.sign(corners - corners.mean(axis=0))
+
+
+def extract_pattern(
+    image: np.ndarray, polygon: np.ndarray, unique_id: str, orientation: Optional[str] = None
+) -> np.ndarray:
+    """
+    Rectifies just the security pattern out of a full-resolution image, using
+    the QR symbol's corners and the orientation zbar read it in to undo scale,
+    rotation (including sideways and upside-down photos) and perspective.
+    """
+    side = symbol_size(unique_id)
+    p_h, p_w = PATTERN_SIZE
+    square = np.float32([[0, 0], [side, 0], [side, side], [0, side]])
+    to_image = cv2.getPerspectiveTransform(square, symbol_corners(image, polygon, side, orientation))
+
+    # Label coordinates of the pattern, which sits at the centre of the symbol
+    x0, y0 = (side - p_w) / 2, (side - p_h) / 2
+    pattern_corners = np.float32([[x0, y0], [x0 + p_w, y0], [x0 + p_w, y0 + p_h], [x0, y0 + p_h]])
+    roi = cv2.perspectiveTransform(pattern_corners[None], to_image)[0]
+
+    roi_w = int(round(np.linalg.norm(roi[1] - roi[0])))
+    roi_h = int(round(np.linalg.norm(roi[3] - roi[0])))
+    upright = (
+        roi[1, 0] > roi[0, 0] and roi[3, 1] > roi[0, 1] and np.ptp(roi[[0, 3], 0]) < 1 and np.ptp(roi[[0, 1], 1]) < 1
+    )
+    if upright and abs(roi_w - p_w) <= 1 and abs(roi_h - p_h) <= 1:
+        # An upright, unscaled label (e.g. the generated PNG): crop exactly
+        # rather than resampling, which would blur the noise pattern.
+        x, y = int(round(roi[0, 0])), int(round(roi[0, 1]))
+        extracted_pattern = image[y : y + p_h, x : x + p_w]
+        if extracted_pattern.shape != PATTERN_SIZE:
+            raise ValueError("The security pattern lies outside the image.")
+        return extracted_pattern
+
+    # Warp the ROI at its native resolution, then area-downsample to the pattern size
+    roi_w, roi_h = max(roi_w, p_w), max(roi_h, p_h)
+    target = np.float32([[0, 0], [roi_w, 0], [roi_w, roi_h], [0, roi_h]])
+    to_roi = cv2.getPerspectiveTransform(target, roi)
+    # Both corner sets are pixel edges; shift so pixel centres line up
+    half = np.float64([[1, 0, 0.5], [0, 1, 0.5], [0, 0, 1]])
+    to_roi = np.linalg.inv(half) @ to_roi @ half
+    rectified = cv2.warpPerspective(
+        image, to_roi, (roi_w, roi_h), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE
+    )
+    if rectified.shape == PATTERN_SIZE:
+        return rectified
+    return cv2.resize(rectified, PATTERN_SIZE[::-1], interpolation=cv2.INTER_AREA)
+
+
+def analyze_image(image_data: bytes) -> ImageAnalysis:
+    """
+    Decodes an uploaded image once, reads the unique ID from its QR code and
+    extracts the security pattern. Raises QRDecodeError if there is no
+    readable QR code.
+    """
+    start = time.perf_counter()
+    image = decode_grayscale(image_data)
+    decoded = time.perf_counter()
+    try:
+        symbol, polygon = find_qr_code(image)
+    except QRDecodeError:
+        raise
+    except Exception as e:
+        raise QRDecodeError(f"Could not process image: {e}")
+    unique_id = symbol.data.decode("utf-8", errors="replace")
+    found = time.perf_counter()
+
+    try:
+        pattern, pattern_error = extract_pattern(image, polygon, unique_id, symbol.orientation), None
+    except Exception as e:
+        pattern, pattern_error = None, str(e)
+    timings = (("image_decode", decoded - start), ("qr_decode", found - decoded), ("extract", time.perf_counter() - found))
+    return ImageAnalysis(unique_id, pattern, pattern_error, timings)
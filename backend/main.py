@@ -1,62 +1,325 @@
 import uuid
+import asyncio
+import contextlib
+import hashlib
+import heapq
 import os
-import numpy as np
-import cv2
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-from pyzbar.pyzbar import decode
-from skimage.metrics import structural_similarity as ssim
 import io
-from PIL import Image
-from .database import database, products
-from .schemas import Product, ProductCreate, VerificationResponse
+import json
+import zipfile
+import numpy as np
+import sqlalchemy
+from typing import Dict, List, NamedTuple, Optional
+from decouple import config
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from . import metrics
+from .cache import LRUCache
+from .database import database, products, scans
+from .imaging import ImageAnalysis, QRDecodeError, analyze_image
+from .patterns import PATTERN_MODE, encode_png, load_master_pattern, pattern_file_path, pattern_store
+from .scan_log import scan_log
+from .schemas import (
+    CloneSuspect,
+    LiveScanProgress,
+    LiveVerificationResponse,
+    Product,
+    ProductBatchCreate,
+    ProductCreate,
+    ProductStatusUpdate,
+    ScanSummary,
+    VerificationResponse,
+)
+from .similarity import MasterStats, compare_patterns, master_stats, similarity_scores
+from .workers import PoolSaturated, verification_pool
+
+# --- BULK REGISTRATION ---
+MAX_BATCH_SIZE = 100_000  # Products per /products/batch request
+BATCH_CHUNK_SIZE = 10_000  # Patterns generated / rows inserted per step
+
+# --- VERIFICATION ---
+AUTHENTICITY_THRESHOLD = 0.90  # 90% similarity required. You can tune this!
+MAX_VERIFY_BATCH_SIZE = 256  # Images per /verify/batch request
+MAX_BATCH_UNZIPPED_BYTES = 512 * 1024 * 1024  # Guards against zip bombs
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+# --- LIVE VERIFICATION ---
+# /verify/live scores a stream of camera frames over a WebSocket and answers
+# as soon as the best few agree, so a blurry frame costs one frame rather
+# than a whole new upload.
+LIVE_TOP_FRAMES = config("LIVE_TOP_FRAMES", default=2, cast=int)  # Confidence is the mean of the best this many scores
+LIVE_MAX_FRAMES = config("LIVE_MAX_FRAMES", default=30, cast=int)  # Frames before deciding on what has been seen
+LIVE_MAX_FRAME_BYTES = config("LIVE_MAX_FRAME_BYTES", default=1024 * 1024, cast=int)
+LIVE_FRAME_TIMEOUT = config("LIVE_FRAME_TIMEOUT", default=10.0, cast=float)  # Seconds to wait for the next frame
 
-# --- PHASE 2 CONSTANTS ---
-PATTERN_SIZE = (48, 48)  # The resolution of our security pattern
-MASTER_PATTERN_DIR = "backend/master_patterns"
-os.makedirs(MASTER_PATTERN_DIR, exist_ok=True)
+# --- PRODUCT CACHE ---
+# Hot codes are scanned thousands of times a day; keep their row and decoded
+# master pattern in memory. The TTL bounds staleness when several server
+# processes share one database, since invalidation is per-process.
+PRODUCT_CACHE_SIZE = config("PRODUCT_CACHE_SIZE", default=10_000, cast=int)
+PRODUCT_CACHE_TTL = config("PRODUCT_CACHE_TTL", default=300, cast=float)
+
+# --- VERDICT CACHE ---
+# Phones often upload the same photo more than once (retries, double taps).
+# Verdicts are cached by the SHA-256 of the uploaded bytes, briefly, so a
+# repeat costs a hash instead of a decode and comparison.
+VERDICT_CACHE_SIZE = config("VERDICT_CACHE_SIZE", default=10_000, cast=int)
+VERDICT_CACHE_TTL = config("VERDICT_CACHE_TTL", default=30, cast=float)
+
+# --- CLONE DETECTION ---
+# A genuine label is photographed by a handful of customers; one code seen in
+# many different images suggests it has been copied onto counterfeit goods.
+CLONE_DISTINCT_IMAGES = config("CLONE_DISTINCT_IMAGES", default=20, cast=int)
 
 app = FastAPI(title="Secure QR Brand Protection - Phase 2")
 
+
+class CachedProduct(NamedTuple):
+    record: dict
+    master: Optional[MasterStats]  # None if the master pattern failed to load
+
+
+product_cache = LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+verdict_cache = LRUCache(VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL)  # image hash -> (unique_id, verdict)
+registration_lock = asyncio.Lock()  # One registration at a time per process, see write_transaction
+
+
 @app.on_event("startup")
 async def startup():
     await database.connect()
+    await verification_pool.start()
+    await scan_log.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+    verification_pool.shutdown()
+    await scan_log.stop()
     await database.disconnect()
 
 
-def generate_and_save_pattern(unique_id: str) -> str:
-    """Generates a random noise pattern and saves it as an image."""
-    pattern_data = np.random.randint(0, 256, (PATTERN_SIZE[0], PATTERN_SIZE[1], 1), dtype=np.uint8)
-    filepath = os.path.join(MASTER_PATTERN_DIR, f"{unique_id}.png")
-    cv2.imwrite(filepath, pattern_data)
-    return filepath
+def generate_unique_ids(count: int) -> list:
+    """Generates `count` random UUID4 strings from a single urandom read."""
+    raw = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=raw[i : i + 16], version=4)) for i in range(0, len(raw), 16)]
+
+
+async def insert_many(rows: List[dict]):
+    """
+    Inserts product rows with one driver-level executemany. databases'
+    execute_many compiles and runs a separate statement per row instead.
+    """
+    columns = list(rows[0])
+    # The database is SQLite (see database.py), so this is written for sqlite3
+    query = (
+        f"INSERT INTO {products.name} ({', '.join(columns)}, creation_date) "
+        f"VALUES ({', '.join('?' for _ in columns)}, CURRENT_TIMESTAMP)"
+    )
+    async with database.connection() as connection:
+        await connection.raw_connection.executemany(query, [tuple(row.values()) for row in rows])
+
+
+@contextlib.asynccontextmanager
+async def write_transaction():
+    """
+    A transaction that holds SQLite's write lock from its first statement.
+    databases' transaction() issues a plain (deferred) BEGIN, so two
+    transactions can both read and then deadlock upgrading to a write.
+    BEGIN IMMEDIATE makes other processes wait instead; the lock queues
+    this process's own registrations without tying up SQLite's busy timeout.
+    """
+    async with registration_lock, database.connection() as connection:
+        raw_connection = connection.raw_connection
+        await raw_connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            await raw_connection.execute("ROLLBACK")
+            raise
+        await raw_connection.execute("COMMIT")
+
+
+async def register_products(entries: List[ProductCreate]) -> List[dict]:
+    """
+    Creates products and their master patterns. Patterns are created one
+    chunk at a time by the current pattern store, and all rows are inserted
+    with executemany inside a single write transaction.
+    """
+    records = []
+    created_paths = []
+
+    try:
+        async with write_transaction():
+            # Ids are assigned up front so executemany does not need to
+            # report them back, and packed patterns can be written at them.
+            # Nothing else can insert until this transaction ends, so they
+            # can't collide, and a rolled-back batch's packed records are
+            # overwritten by whichever batch gets its ids next.
+            last_id = await database.fetch_val(sqlalchemy.select(sqlalchemy.func.max(products.c.id))) or 0
+
+            for start in range(0, len(entries), BATCH_CHUNK_SIZE):
+                chunk = entries[start : start + BATCH_CHUNK_SIZE]
+                ids = list(range(last_id + start + 1, last_id + start + len(chunk) + 1))
+                unique_ids = generate_unique_ids(len(chunk))
+                with metrics.stage("pattern_create"):
+                    paths = await run_in_threadpool(pattern_store.create, ids, unique_ids)
+                created_paths.extend(paths)
+
+                rows = [
+                    {
+                        "id": record_id,
+                        "unique_id": unique_id,
+                        "product_name": entry.product_name,
+                        "company_name": entry.company_name,
+                        "is_authentic": True,
+                        "master_pattern_path": path,
+                        "pattern_mode": PATTERN_MODE,
+                    }
+                    for entry, record_id, unique_id, path in zip(chunk, ids, unique_ids, paths)
+                ]
+                with metrics.stage("db_insert"):
+                    await insert_many(rows)
+                records.extend(rows)
+    except Exception:
+        pattern_store.discard(created_paths)
+        raise
+    return records
 
 
 @app.post("/products/", response_model=Product, status_code=201)
-async def create_product(product: ProductCreate):
+async def create_product(product: ProductCreate, response: Response):
     """
     Generates a new product, creates its unique master pattern,
     and stores both in the database.
     """
-    unique_id = str(uuid.uuid4())
-    master_pattern_path = generate_and_save_pattern(unique_id)
+    timer = metrics.start_timer("create_product")
+    try:
+        (record,) = await register_products([product])
+    finally:
+        timer.finish(response)
+    return record
 
-    query = products.insert().values(
-        unique_id=unique_id,
-        product_name=product.product_name,
-        company_name=product.company_name,
-        master_pattern_path=master_pattern_path,
+
+def expand_batch(batch: ProductBatchCreate) -> list:
+    """Turns a batch request into one ProductCreate entry per product."""
+    if batch.products is not None:
+        if batch.count is not None or batch.product is not None:
+            raise HTTPException(status_code=422, detail="Send either `products` or `count` with `product`, not both.")
+        count = len(batch.products)
+    elif batch.count is not None and batch.product is not None:
+        count = batch.count
+    else:
+        raise HTTPException(status_code=422, detail="Send either `products` or `count` with `product`.")
+
+    # Checked before expanding `count`, which could otherwise be any size
+    if not 0 < count <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"A batch must contain between 1 and {MAX_BATCH_SIZE} products.")
+    return batch.products if batch.products is not None else [batch.product] * count
+
+
+@app.post("/products/batch", status_code=201)
+async def create_products_batch(batch: ProductBatchCreate):
+    """
+    Registers many products at once, in one transaction, and streams the
+    created products back as NDJSON.
+    """
+    records = await register_products(expand_batch(batch))
+    return StreamingResponse(
+        (json.dumps(record) + "\n" for record in records),
+        media_type="application/x-ndjson",
+        status_code=201,
     )
-    last_record_id = await database.execute(query)
-    return {
-        "id": last_record_id,
-        "unique_id": unique_id,
-        "master_pattern_path": master_pattern_path,
-        **product.dict(),
-    }
+
+
+def cache_product(record, generation) -> CachedProduct:
+    """
+    Loads a row's master pattern and caches both, unless the product was
+    invalidated after `generation` was taken. Rows whose pattern fails to
+    load aren't cached.
+    """
+    record = dict(record._mapping)
+    try:
+        # The master's windowed statistics are computed here, once per cache
+        # fill, rather than on every scan
+        with metrics.stage("master_load"):
+            master = master_stats(load_master_pattern(record))
+    except Exception:
+        # Left for the caller to reload and report
+        return CachedProduct(record, None)
+
+    cached = CachedProduct(record, master)
+    product_cache.put(record["unique_id"], cached, generation)
+    return cached
+
+
+async def get_products(unique_ids) -> Dict[str, CachedProduct]:
+    """
+    Returns product rows and their decoded master patterns, keyed by unique_id.
+    Cached products are served from memory and the rest are fetched with a
+    single query. Unknown unique_ids are left out.
+    """
+    found = {}
+    missing = []
+    for unique_id in set(unique_ids):
+        cached = product_cache.get(unique_id)
+        if cached is not None:
+            found[unique_id] = cached
+        else:
+            missing.append(unique_id)
+
+    if missing:
+        # Taken before the query, so a row read before a status change can't be cached after it
+        generations = {unique_id: product_cache.generation(unique_id) for unique_id in missing}
+        query = products.select().where(products.c.unique_id.in_(missing))
+        with metrics.stage("db_query"):
+            records = await database.fetch_all(query)
+        for record in records:
+            found[record["unique_id"]] = cache_product(record, generations[record["unique_id"]])
+    return found
+
+
+async def get_product(unique_id: str) -> Optional[CachedProduct]:
+    """Returns a product row and its decoded master pattern, from the cache when possible."""
+    return (await get_products([unique_id])).get(unique_id)
+
+
+@app.patch("/products/{unique_id}", response_model=Product)
+async def update_product_status(unique_id: str, update: ProductStatusUpdate):
+    """Marks a product as authentic or revoked, e.g. after a recall or known leak."""
+    record = await database.fetch_one(products.select().where(products.c.unique_id == unique_id))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Product not found.")
+
+    # Caches are only invalidated when the status actually changes
+    if record["is_authentic"] != update.is_authentic:
+        query = (
+            products.update()
+            .where(products.c.unique_id == unique_id)
+            .values(is_authentic=update.is_authentic)
+        )
+        await database.execute(query)
+        product_cache.invalidate(unique_id)
+        verdict_cache.clear()  # Cached verdicts are keyed by image, not product
+
+    product = await get_product(unique_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    return Product(**product.record)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-stage latency, verification outcome, score and upload size metrics, for Prometheus."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    return {"products": product_cache.stats(), "verdicts": verdict_cache.stats(), "scan_log": scan_log.stats()}
 
 
 @app.get("/products/{unique_id}/master_pattern")
@@ -64,93 +327,429 @@ async def get_master_pattern(unique_id: str):
     """Allows the generator client to download the master pattern."""
     query = products.select().where(products.c.unique_id == unique_id)
     result = await database.fetch_one(query)
-    if not result or not os.path.exists(result["master_pattern_path"]):
+    if not result:
         raise HTTPException(status_code=404, detail="Product or pattern not found.")
-    return FileResponse(result["master_pattern_path"])
-
-
-def compare_patterns(image1_path, image2_data) -> float:
-    """Compares two patterns using Structural Similarity Index (SSIM)."""
-    master_pattern = cv2.imread(image1_path, cv2.IMREAD_GRAYSCALE)
-    
-    # Convert uploaded image data from bytes to a numpy array
-    nparr = np.frombuffer(image2_data, np.uint8)
-    uploaded_image = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
-    
-    # Extract the central pattern from the uploaded QR code image
-    # Note: This assumes the generator always places the pattern perfectly in the center.
-    h, w = uploaded_image.shape
-    center_x, center_y = w // 2, h // 2
-    p_h, p_w = PATTERN_SIZE
-    
-    start_x = center_x - p_w // 2
-    start_y = center_y - p_h // 2
-    
-    extracted_pattern = uploaded_image[start_y : start_y + p_h, start_x : start_x + p_w]
-
-    if extracted_pattern.shape != master_pattern.shape:
-        # Resize for a basic comparison if shapes don't match
-        extracted_pattern = cv2.resize(extracted_pattern, master_pattern.shape[::-1])
-        
-    # Calculate the structural similarity
-    score, _ = ssim(master_pattern, extracted_pattern, full=True)
-    return score
 
+    if result["pattern_mode"] in ("keyed", "packed"):
+        # Rendered in memory on demand
+        try:
+            pattern = load_master_pattern(result)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Product or pattern not found.")
+        return Response(content=encode_png(pattern), media_type="image/png")
 
-@app.post("/verify/image", response_model=VerificationResponse)
-async def verify_product_by_image(file: UploadFile = File(...)):
-    """
-    The CORE of Phase 2. Receives an image, finds the QR code and pattern,
-    and compares it to the master pattern.
-    """
-    image_data = await file.read()
+    path = pattern_file_path(result["master_pattern_path"] or "")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Product or pattern not found.")
+    return FileResponse(path)
 
-    # 1. Decode the unique ID from the QR code within the image
-    try:
-        decoded_objects = decode(Image.open(io.BytesIO(image_data)))
-        if not decoded_objects:
-            raise HTTPException(status_code=400, detail="No QR code found in the image.")
-        unique_id = decoded_objects[0].data.decode("utf-8")
-    except Exception as e:
-        # Catch potential decoding errors
-        raise HTTPException(status_code=400, detail=f"Could not process image: {e}")
-    
-    # 2. Fetch the product from the database
-    query = products.select().where(products.c.unique_id == unique_id)
-    product_record = await database.fetch_one(query)
 
-    if not product_record:
+@app.get("/products/{unique_id}/scans", response_model=ScanSummary)
+async def get_scan_summary(unique_id: str):
+    """How often, and from how many distinct images, a code has been verified."""
+    await scan_log.flush()  # Include scans still waiting in the buffer
+    distinct_images = sqlalchemy.func.count(sqlalchemy.distinct(scans.c.image_hash))
+    query = sqlalchemy.select(
+        sqlalchemy.func.count().label("total_scans"),
+        distinct_images.label("distinct_images"),
+        sqlalchemy.func.min(scans.c.scanned_at).label("first_scan"),
+        sqlalchemy.func.max(scans.c.scanned_at).label("last_scan"),
+    ).where(scans.c.unique_id == unique_id)
+    summary = dict((await database.fetch_one(query))._mapping)
+    if not summary["total_scans"] and await get_product(unique_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found.")
+
+    query = (
+        sqlalchemy.select(scans.c.status, sqlalchemy.func.count().label("count"))
+        .where(scans.c.unique_id == unique_id)
+        .group_by(scans.c.status)
+    )
+    statuses = {record["status"]: record["count"] for record in await database.fetch_all(query)}
+    return ScanSummary(
+        unique_id=unique_id,
+        statuses=statuses,
+        suspected_clone=summary["distinct_images"] >= CLONE_DISTINCT_IMAGES,
+        **summary,
+    )
+
+
+@app.get("/scans/suspected_clones", response_model=List[CloneSuspect])
+async def get_suspected_clones(min_distinct_images: int = CLONE_DISTINCT_IMAGES, limit: int = 100):
+    """Codes verified from at least `min_distinct_images` different images, most first."""
+    await scan_log.flush()
+    distinct_images = sqlalchemy.func.count(sqlalchemy.distinct(scans.c.image_hash)).label("distinct_images")
+    query = (
+        sqlalchemy.select(scans.c.unique_id, sqlalchemy.func.count().label("total_scans"), distinct_images)
+        .where(scans.c.unique_id.isnot(None))
+        .group_by(scans.c.unique_id)
+        .having(distinct_images >= min_distinct_images)
+        .order_by(distinct_images.desc())
+        .limit(limit)
+    )
+    return [CloneSuspect(**record._mapping) for record in await database.fetch_all(query)]
+
+
+def early_verdict(product: Optional[CachedProduct]) -> Optional[VerificationResponse]:
+    """The verdict for codes that fail before their pattern needs comparing, if any."""
+    if not product:
         return VerificationResponse(
             status="COUNTERFEIT",
             message="This product code does not exist. This is a suspected counterfeit.",
         )
-
-    # 3. Compare the embedded pattern with the master pattern
-    master_pattern_path = product_record["master_pattern_path"]
-    try:
-        similarity_score = compare_patterns(master_pattern_path, image_data)
-    except Exception as e:
-        # If comparison fails for any reason (e.g., can't find pattern)
+    if product.record["is_authentic"] is False:
         return VerificationResponse(
-            status="UNABLE_TO_VERIFY",
-            message=f"Could not analyze security pattern. Error: {e}",
-            product_data=Product(**product_record)
+            status="COUNTERFEIT",
+            message="This product code has been revoked. This is a suspected counterfeit.",
+            product_data=Product(**product.record),
         )
+    return None
 
-    # 4. Make a decision based on the similarity score
-    AUTHENTICITY_THRESHOLD = 0.90  # 90% similarity required. You can tune this!
 
+def patterns_to_compare(analysis: ImageAnalysis, product: CachedProduct):
+    """Returns the (master stats, extracted pattern) pair, raising if either is unavailable."""
+    master = product.master
+    if master is None:
+        master = master_stats(load_master_pattern(product.record))
+    if analysis.pattern is None:
+        raise ValueError(analysis.pattern_error)
+    return master, analysis.pattern
+
+
+def unable_to_verify(product: CachedProduct, error: Exception) -> VerificationResponse:
+    return VerificationResponse(
+        status="UNABLE_TO_VERIFY",
+        message=f"Could not analyze security pattern. Error: {error}",
+        product_data=Product(**product.record),
+    )
+
+
+def score_verdict(product: CachedProduct, similarity_score: float) -> VerificationResponse:
+    """Makes a decision based on the similarity score."""
     if similarity_score >= AUTHENTICITY_THRESHOLD:
         return VerificationResponse(
             status="AUTHENTIC",
             message="This product is authentic.",
             similarity_score=similarity_score,
-            product_data=Product(**product_record),
+            product_data=Product(**product.record),
         )
     else:
         return VerificationResponse(
             status="COUNTERFEIT",
             message="The security pattern does not match the original. This is a suspected counterfeit.",
             similarity_score=similarity_score,
-            product_data=Product(**product_record),
-        )
\ No newline at end of file
+            product_data=Product(**product.record),
+        )
+
+
+def busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The server is busy verifying other scans. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.post("/verify/image", response_model=VerificationResponse)
+async def verify_product_by_image(response: Response, file: UploadFile = File(...)):
+    """
+    The CORE of Phase 2. Receives an image, finds the QR code and pattern,
+    and compares it to the master pattern.
+    """
+    timer = metrics.start_timer("verify_image")
+    try:
+        verdict = await verify_upload(file, timer)
+    finally:
+        timer.finish(response)
+    metrics.observe_verification(verdict.status, verdict.similarity_score)
+    return verdict
+
+
+async def verify_upload(file: UploadFile, timer) -> VerificationResponse:
+    with timer.stage("read"):
+        image_data = await file.read()
+    metrics.observe_upload(len(image_data))
+    with timer.stage("hash"):
+        image_hash = hashlib.sha256(image_data).hexdigest()
+
+    # A retried upload of the same photo gets the same verdict without redoing the work
+    cached = verdict_cache.get(image_hash)
+    if cached is not None:
+        unique_id, verdict = cached
+    else:
+        # Taken first, so a verdict reached before a status change isn't cached after it
+        generation = verdict_cache.generation(image_hash)
+        try:
+            unique_id, verdict = await verify_image_data(image_data, timer)
+        except PoolSaturated:
+            metrics.observe_verification("BUSY")
+            raise busy_error()
+        except QRDecodeError as e:
+            metrics.observe_verification("UNREADABLE")
+            scan_log.record(None, image_hash, "UNREADABLE")
+            raise HTTPException(status_code=400, detail=str(e))
+        verdict_cache.put(image_hash, (unique_id, verdict), generation)
+
+    scan_log.record(unique_id, image_hash, verdict.status, verdict.similarity_score)
+    return verdict
+
+
+async def verify_image_data(image_data: bytes, timer):
+    """Returns the unique_id read from the image and the verdict for it."""
+    # 1. Decode the unique ID and extract the pattern, off the event loop
+    with timer.stage("analyze"):
+        analysis = await verification_pool.run(analyze_image, image_data)
+    for name, seconds in analysis.timings:  # Measured in the worker
+        timer.record(name, seconds)
+
+    # 2. Fetch the product (and its master pattern) from the cache or database
+    product = await get_product(analysis.unique_id)
+    verdict = early_verdict(product)
+    if verdict:
+        return analysis.unique_id, verdict
+
+    # 3. Compare the embedded pattern with the master pattern
+    try:
+        with timer.stage("similarity"):
+            similarity_score = compare_patterns(*patterns_to_compare(analysis, product))
+    except Exception as e:
+        # If comparison fails for any reason (e.g., can't find pattern)
+        return analysis.unique_id, unable_to_verify(product, e)
+
+    # 4. Make a decision based on the similarity score
+    return analysis.unique_id, score_verdict(product, similarity_score)
+
+
+def batch_size_error() -> HTTPException:
+    return HTTPException(status_code=422, detail=f"A batch must contain between 1 and {MAX_VERIFY_BATCH_SIZE} images.")
+
+
+async def read_batch_images(files: List[UploadFile]) -> List[bytes]:
+    """Reads the uploaded images, unpacking any zip archives in place."""
+    images = []
+    for file in files:
+        data = await file.read()
+        if file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    entries = [info for info in archive.infolist() if not info.is_dir()]
+                    # Checked before decompressing anything
+                    if len(images) + len(entries) > MAX_VERIFY_BATCH_SIZE:
+                        raise batch_size_error()
+                    if sum(info.file_size for info in entries) > MAX_BATCH_UNZIPPED_BYTES:
+                        raise HTTPException(status_code=413, detail="The zip archive is too large once unpacked.")
+                    images.extend(archive.read(info) for info in entries)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid zip archive.")
+        else:
+            images.append(data)
+        if len(images) > MAX_VERIFY_BATCH_SIZE:
+            raise batch_size_error()
+
+    if not images:
+        raise batch_size_error()
+    return images
+
+
+@app.post("/verify/batch", response_model=List[VerificationResponse])
+async def verify_products_batch(response: Response, files: List[UploadFile] = File(...)):
+    """
+    Verifies many images (uploaded individually or as zip archives) in one
+    request, for inspection stations scanning whole cartons. Images are
+    analysed in parallel, products are fetched with one query, and every
+    pattern is scored in a single vectorised similarity call. Results are
+    returned in input order.
+    """
+    timer = metrics.start_timer("verify_batch")
+    try:
+        results = await verify_images(files, timer)
+    finally:
+        timer.finish(response)
+    for result in results:
+        metrics.observe_verification(result.status, result.similarity_score)
+    return results
+
+
+async def verify_images(files: List[UploadFile], timer) -> List[VerificationResponse]:
+    with timer.stage("read"):
+        images = await read_batch_images(files)
+    for image in images:
+        metrics.observe_upload(len(image))
+    with timer.stage("hash"):
+        hashes = [hashlib.sha256(image).hexdigest() for image in images]
+
+    results: List[Optional[VerificationResponse]] = [None] * len(images)
+    unique_ids: List[Optional[str]] = [None] * len(images)
+    to_analyze = []
+    generations = {}  # See verify_upload
+    for i, image_hash in enumerate(hashes):
+        cached = verdict_cache.get(image_hash)
+        if cached is not None:
+            unique_ids[i], results[i] = cached
+        else:
+            to_analyze.append(i)
+            generations[i] = verdict_cache.generation(image_hash)
+
+    if to_analyze:
+        try:
+            with timer.stage("analyze"):
+                analyses = await verification_pool.run_many(analyze_image, [images[i] for i in to_analyze])
+        except PoolSaturated:
+            metrics.observe_verification("BUSY")
+            raise busy_error()
+        await score_analyses(dict(zip(to_analyze, analyses)), results, unique_ids, timer)
+
+    for i, image_hash in enumerate(hashes):
+        result = results[i]
+        if unique_ids[i] is None:
+            scan_log.record(None, image_hash, "UNREADABLE")
+            continue
+        if i in generations:
+            verdict_cache.put(image_hash, (unique_ids[i], result), generations[i])
+        scan_log.record(unique_ids[i], image_hash, result.status, result.similarity_score)
+    return results
+
+
+async def score_analyses(analyses: dict, results: list, unique_ids: list, timer):
+    """Fills in results and unique_ids for {index: analysis or exception}, scoring every pattern in one call."""
+    found = await get_products(a.unique_id for a in analyses.values() if isinstance(a, ImageAnalysis))
+
+    to_score = []  # (index, product, master, pattern)
+    for i, analysis in analyses.items():
+        if isinstance(analysis, QRDecodeError):
+            results[i] = VerificationResponse(status="UNABLE_TO_VERIFY", message=str(analysis))
+            continue
+        if isinstance(analysis, Exception):
+            results[i] = VerificationResponse(status="UNABLE_TO_VERIFY", message=f"Could not process image: {analysis}")
+            continue
+
+        unique_ids[i] = analysis.unique_id
+        product = found.get(analysis.unique_id)
+        results[i] = early_verdict(product)
+        if results[i]:
+            continue
+        try:
+            to_score.append((i, product, *patterns_to_compare(analysis, product)))
+        except Exception as e:
+            results[i] = unable_to_verify(product, e)
+
+    if to_score:
+        indices, batch_products, masters, patterns = zip(*to_score)
+        with timer.stage("similarity"):
+            scores = similarity_scores(masters, np.stack(patterns))
+        for i, product, score in zip(indices, batch_products, scores):
+            results[i] = score_verdict(product, float(score))
+
+
+class LiveSession:
+    """What /verify/live keeps between the frames of one connection."""
+
+    def __init__(self):
+        self.unique_id: Optional[str] = None  # From the first readable frame
+        self.product: Optional[CachedProduct] = None
+        self.master: Optional[MasterStats] = None
+        self.frames = 0
+        self.scores: List[float] = []  # One per frame whose pattern was compared
+        self.best_hash: Optional[str] = None  # SHA-256 of the best-scoring frame, for the scan log
+
+    def add_score(self, score: float, frame: bytes):
+        if not self.scores or score > max(self.scores):
+            self.best_hash = hashlib.sha256(frame).hexdigest()
+        self.scores.append(score)
+
+    def confidence(self) -> Optional[float]:
+        if not self.scores:
+            return None
+        return float(np.mean(heapq.nlargest(LIVE_TOP_FRAMES, self.scores)))
+
+    def final_verdict(self) -> VerificationResponse:
+        """The verdict once frames run out: judged on whatever was scored."""
+        if self.unique_id is None:
+            return VerificationResponse(status="UNABLE_TO_VERIFY", message="No QR code was found in the camera frames.")
+        if not self.scores:
+            return unable_to_verify(self.product, ValueError("no frame showed a readable security pattern"))
+        return score_verdict(self.product, self.confidence())
+
+
+@app.websocket("/verify/live")
+async def verify_live(websocket: WebSocket):
+    """
+    Live-camera verification. The client sends camera frames (JPEG or PNG) as
+    binary messages and gets a LiveScanProgress after each one, until a
+    LiveVerificationResponse ends the session. The product and its master
+    pattern are looked up once, from the first frame with a readable code.
+    """
+    await websocket.accept()
+    timer = metrics.start_timer("verify_live")
+    session = LiveSession()
+    try:
+        verdict = await run_live_session(websocket, session, timer)
+    except WebSocketDisconnect:
+        return
+    finally:
+        timer.finish()
+
+    metrics.observe_verification(verdict.status, verdict.similarity_score)
+    scan_log.record(session.unique_id, session.best_hash, verdict.status, verdict.similarity_score)
+    result = LiveVerificationResponse(**jsonable_encoder(verdict), frames=session.frames)
+    await websocket.send_json(jsonable_encoder(result))
+    await websocket.close()
+
+
+async def run_live_session(websocket: WebSocket, session: LiveSession, timer) -> VerificationResponse:
+    while session.frames < LIVE_MAX_FRAMES:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), LIVE_FRAME_TIMEOUT)
+        except asyncio.TimeoutError:
+            break
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        session.frames += 1
+        frame = message.get("bytes")
+        if frame is None:
+            progress = "Send camera frames as binary messages."
+        elif len(frame) > LIVE_MAX_FRAME_BYTES:
+            progress = f"Frames must be under {LIVE_MAX_FRAME_BYTES} bytes; send a lower resolution."
+        else:
+            verdict, progress = await score_frame(session, frame, timer)
+            if verdict:
+                return verdict
+        update = LiveScanProgress(message=progress, frames=session.frames, confidence=session.confidence())
+        await websocket.send_json(jsonable_encoder(update))
+    return session.final_verdict()
+
+
+async def score_frame(session: LiveSession, frame: bytes, timer):
+    """Scores one frame. Returns (verdict, None) once there is a verdict, else (None, progress message)."""
+    try:
+        with timer.stage("analyze"):
+            analysis = await verification_pool.run(analyze_image, frame)
+    except PoolSaturated:
+        return None, "The server is busy; frame skipped."
+    except QRDecodeError:
+        return None, "No QR code found. Hold the code steady inside the frame."
+    for name, seconds in analysis.timings:
+        timer.record(name, seconds)
+
+    if session.unique_id is None:
+        session.unique_id = analysis.unique_id
+        session.product = await get_product(analysis.unique_id)
+        verdict = early_verdict(session.product)
+        if verdict:
+            return verdict, None
+        try:
+            session.master = session.product.master or master_stats(load_master_pattern(session.product.record))
+        except Exception as e:
+            return unable_to_verify(session.product, e), None
+    elif analysis.unique_id != session.unique_id:
+        return None, "A different code came into view; frame ignored."
+
+    if analysis.pattern is None:
+        return None, "Could not read the security pattern. Move closer or hold still."
+    with timer.stage("similarity"):
+        session.add_score(compare_patterns(session.master, analysis.pattern), frame)
+
+    confidence = session.confidence()
+    if len(session.scores) >= LIVE_TOP_FRAMES and confidence >= AUTHENTICITY_THRESHOLD:
+        return score_verdict(session.product, confidence), None
+    return None, "Scanning..."
@@ -0,0 +1,167 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+from decouple import config
+
+# --- METRICS ---
+# Per-stage timings are returned as Server-Timing headers and, with the other
+# metrics below, served in Prometheus text format from GET /metrics. Values
+# are per server process. With METRICS_ENABLED off, timers are no-ops.
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+SIZE_BUCKETS = tuple(2.0**power for power in range(12, 26))  # 4 KiB to 32 MiB
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {float(value)!r}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    labels = _format_labels(self.label_names, label_values, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {float(series[-1])!r}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "safeqr_stage_duration_seconds", "Time spent in each stage of a request.", LATENCY_BUCKETS, ("endpoint", "stage")
+)
+verifications = Counter("safeqr_verifications_total", "Verified images by outcome.", ("status",))
+similarity_scores = Histogram("safeqr_similarity_score", "Similarity between scanned and master patterns.", SCORE_BUCKETS)
+upload_bytes = Histogram("safeqr_upload_size_bytes", "Size of uploaded verification images.", SIZE_BUCKETS)
+ALL_METRICS = (stage_seconds, verifications, similarity_scores, upload_bytes)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in ALL_METRICS for line in metric.expose()) + "\n"
+
+
+class StageTimer:
+    """Times the stages of one request, for its Server-Timing header and the stage histogram."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = []  # (name, seconds), in the order they finished
+
+    def record(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+        stage_seconds.observe(seconds, self.endpoint, name)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def finish(self, response=None):
+        """Records the request's total time and sets Server-Timing on `response`, if given."""
+        self.record("total", time.perf_counter() - self.started)
+        _current_timer.set(None)
+        if response is not None:
+            response.headers["Server-Timing"] = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages)
+
+
+class NullTimer:
+    """Stands in for StageTimer when metrics are disabled."""
+
+    def record(self, name: str, seconds: float):
+        pass
+
+    def stage(self, name: str):
+        return _NO_STAGE
+
+    def finish(self, response=None):
+        pass
+
+
+_NO_STAGE = contextlib.nullcontext()
+NULL_TIMER = NullTimer()
+# The current request's timer, so shared helpers can time their own stages
+_current_timer: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar("stage_timer", default=None)
+
+
+def start_timer(endpoint: str):
+    """Starts timing a request; helpers it calls can add stages through stage()."""
+    if not METRICS_ENABLED:
+        return NULL_TIMER
+    timer = StageTimer(endpoint)
+    _current_timer.set(timer)
+    return timer
+
+
+def stage(name: str):
+    """Times a block as a stage of the current request, if one is being timed."""
+    timer = _current_timer.get()
+    return timer.stage(name) if timer is not None else _NO_STAGE
+
+
+def observe_verification(status: str, score: Optional[float] = None):
+    if not METRICS_ENABLED:
+        return
+    verifications.inc(status)
+    if score is not None:
+        similarity_scores.observe(score)
+
+
+def observe_upload(size: int):
+    if METRICS_ENABLED:
+        upload_bytes.observe(size)
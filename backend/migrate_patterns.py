@@ -0,0 +1,79 @@
+"""
+Imports file-backed master patterns into the packed pattern store.
+
+    python -m backend.migrate_patterns [--remove-files] [--batch-size N]
+
+Each migrated row switches to pattern_mode "packed". Rows whose PNG is
+missing or unreadable are reported and left untouched, so they keep using
+their master_pattern_path. The tool can be re-run safely, e.g. after an
+interruption.
+"""
+import argparse
+import os
+import cv2
+import numpy as np
+import sqlalchemy
+from .database import engine, products
+from .patterns import PATTERN_SIZE, PATTERN_STORES, pattern_file_path
+
+
+def migrate(batch_size: int = 10_000, remove_files: bool = False):
+    """Migrates every file-backed row, returning (migrated, skipped) counts."""
+    store = PATTERN_STORES["packed"]
+    file_backed = sqlalchemy.or_(products.c.pattern_mode.is_(None), products.c.pattern_mode == "file")
+    migrated = skipped = 0
+    last_id = 0
+
+    while True:
+        query = (
+            sqlalchemy.select(products.c.id, products.c.master_pattern_path)
+            .where(file_backed, products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(batch_size)
+        )
+        with engine.connect() as connection:
+            rows = connection.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        ids, paths, patterns = [], [], []
+        for row in rows:
+            path = pattern_file_path(row.master_pattern_path or "")
+            pattern = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if pattern is None or pattern.shape != PATTERN_SIZE:
+                print(f"[SKIPPED] Product {row.id}: no usable pattern at {path}")
+                skipped += 1
+                continue
+            ids.append(row.id)
+            paths.append(path)
+            patterns.append(pattern)
+        if not ids:
+            continue
+
+        # Write the records before switching the rows over, so an interrupted
+        # run never leaves a row pointing at a record that isn't there
+        store.write(ids, np.stack(patterns))
+        values = {"pattern_mode": "packed"}
+        if remove_files:
+            values["master_pattern_path"] = None
+        with engine.begin() as connection:
+            connection.execute(products.update().where(products.c.id.in_(ids)).values(**values))
+        if remove_files:
+            for path in paths:
+                os.remove(path)
+
+        migrated += len(ids)
+        print(f"Migrated {migrated} patterns...")
+
+    return migrated, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import master pattern PNGs into the packed pattern store.")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Rows migrated per transaction.")
+    parser.add_argument("--remove-files", action="store_true", help="Delete each PNG once it has been imported.")
+    args = parser.parse_args()
+
+    migrated, skipped = migrate(args.batch_size, args.remove_files)
+    print(f"--- Done: {migrated} migrated, {skipped} skipped ---")
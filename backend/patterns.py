@@ -0,0 +1,177 @@
+import abc
+import hashlib
+import hmac
+import os
+import threading
+from typing import List, Optional, Sequence
+import cv2
+import numpy as np
+from decouple import config
+
+PATTERN_SIZE = (48, 48)  # The resolution of our security pattern
+MASTER_PATTERN_DIR = config("MASTER_PATTERN_DIR", default="backend/master_patterns")
+os.makedirs(MASTER_PATTERN_DIR, exist_ok=True)
+
+# --- PATTERN STORES ---
+# PATTERN_MODE picks where new products' master patterns live; each row
+# records its own pattern_mode, so existing rows keep working when it changes.
+#   "file":   a random PNG per product under MASTER_PATTERN_DIR
+#   "keyed":  derived from the unique_id under PATTERN_SECRET, nothing stored
+#   "packed": random, in one append-only file of raw records indexed by id
+PATTERN_MODES = ("file", "keyed", "packed")
+PATTERN_MODE = config("PATTERN_MODE", default="file")
+PATTERN_SECRET = config("PATTERN_SECRET", default="")
+PACKED_PATTERN_FILE = config("PACKED_PATTERN_FILE", default="backend/master_patterns.bin")
+
+if PATTERN_MODE not in PATTERN_MODES:
+    raise RuntimeError(f"PATTERN_MODE must be one of {PATTERN_MODES}, got {PATTERN_MODE!r}.")
+if PATTERN_MODE == "keyed" and not PATTERN_SECRET:
+    raise RuntimeError("PATTERN_MODE=keyed requires PATTERN_SECRET to be set.")
+
+
+def generate_patterns(count: int) -> np.ndarray:
+    """Generates `count` random noise patterns with a single NumPy call."""
+    return np.random.randint(0, 256, (count, PATTERN_SIZE[0], PATTERN_SIZE[1]), dtype=np.uint8)
+
+
+def save_pattern(unique_id: str, pattern_data: np.ndarray) -> str:
+    """Saves a master pattern as an image and returns its path."""
+    filepath = os.path.join(MASTER_PATTERN_DIR, f"{unique_id}.png")
+    cv2.imwrite(filepath, pattern_data)
+    return filepath
+
+
+def generate_and_save_pattern(unique_id: str) -> str:
+    """Generates a random noise pattern and saves it as an image."""
+    return save_pattern(unique_id, generate_patterns(1)[0])
+
+
+def keyed_pattern(unique_id: str) -> np.ndarray:
+    """
+    Derives a product's master pattern from HMAC-SHA256(PATTERN_SECRET, unique_id).
+    The MAC keys a counter-based Philox generator, so the same unique_id always
+    yields the same pattern and nobody without the secret can predict it.
+    """
+    if not PATTERN_SECRET:
+        raise RuntimeError("PATTERN_SECRET is required to regenerate keyed patterns.")
+    digest = hmac.new(PATTERN_SECRET.encode(), unique_id.encode(), hashlib.sha256).digest()
+    rng = np.random.Generator(np.random.Philox(key=int.from_bytes(digest[:16], "little")))
+    return rng.integers(0, 256, PATTERN_SIZE, dtype=np.uint8)
+
+
+def pattern_file_path(master_pattern_path: str) -> str:
+    """Normalises stored paths, which may have been written on Windows."""
+    return os.path.normpath(master_pattern_path.replace("\\", "/"))
+
+
+class PatternStore(abc.ABC):
+    """Creates and loads master patterns for one pattern_mode."""
+
+    @abc.abstractmethod
+    def create(self, ids: Sequence[int], unique_ids: Sequence[str]) -> List[Optional[str]]:
+        """Creates master patterns for new products and returns their master_pattern_path values."""
+
+    @abc.abstractmethod
+    def load(self, product_record) -> np.ndarray:
+        """Returns a product's master pattern as a grayscale array."""
+
+    def discard(self, paths: Sequence[Optional[str]]):
+        """Cleans up after create() when the products it was called for are rolled back."""
+
+
+class FilePatternStore(PatternStore):
+    def create(self, ids, unique_ids):
+        return [save_pattern(u, p) for u, p in zip(unique_ids, generate_patterns(len(unique_ids)))]
+
+    def load(self, product_record):
+        path = pattern_file_path(product_record["master_pattern_path"] or "")
+        master_pattern = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if master_pattern is None:
+            raise FileNotFoundError(f"Master pattern not found: {path}")
+        return master_pattern
+
+    def discard(self, paths):
+        # Don't leave orphaned pattern files behind
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+class KeyedPatternStore(PatternStore):
+    def create(self, ids, unique_ids):
+        return [None] * len(unique_ids)  # Derived on demand, so there is nothing to save
+
+    def load(self, product_record):
+        return keyed_pattern(product_record["unique_id"])
+
+
+class PackedPatternStore(PatternStore):
+    """
+    Master patterns as fixed-size raw records in a single file, the record for
+    products.id N at offset N * RECORD_SIZE. Records are written once, when a
+    product is created, and read through a read-only memory map, so loading a
+    pattern is a zero-copy view with no file open or decode.
+    """
+
+    RECORD_SIZE = PATTERN_SIZE[0] * PATTERN_SIZE[1]
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def write(self, ids: Sequence[int], patterns: np.ndarray):
+        """Writes each pattern at its product id's record."""
+        # Opened for in-place writes, creating the file without truncating it
+        # ("r+b" alone needs it to exist). os.pwrite would be Unix-only.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        with os.fdopen(fd, "r+b") as f:
+            start = 0
+            # Ids usually arrive in runs, and a run is one contiguous write
+            for end in range(1, len(ids) + 1):
+                if end == len(ids) or ids[end] != ids[end - 1] + 1:
+                    f.seek(ids[start] * self.RECORD_SIZE)
+                    f.write(patterns[start:end].tobytes())
+                    start = end
+
+    def create(self, ids, unique_ids):
+        self.write(ids, generate_patterns(len(ids)))
+        return [None] * len(ids)
+
+    def load(self, product_record):
+        record_id = product_record["id"]
+        records = self._map
+        if records is None or record_id >= len(records):
+            with self._lock:
+                # The file has grown since it was mapped
+                size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                count = size // self.RECORD_SIZE
+                if count:
+                    self._map = np.memmap(self.path, dtype=np.uint8, mode="r", shape=(count, *PATTERN_SIZE))
+                records = self._map
+        if records is None or record_id >= len(records):
+            raise FileNotFoundError(f"No packed master pattern for product {record_id}.")
+        return records[record_id]
+
+
+PATTERN_STORES = {
+    "file": FilePatternStore(),
+    "keyed": KeyedPatternStore(),
+    "packed": PackedPatternStore(PACKED_PATTERN_FILE),
+}
+# Where new products' patterns go
+pattern_store = PATTERN_STORES[PATTERN_MODE]
+
+
+def load_master_pattern(product_record) -> np.ndarray:
+    """Returns a product's master pattern as a grayscale array."""
+    # Rows created before pattern_mode existed are all file-backed
+    return PATTERN_STORES[product_record["pattern_mode"] or "file"].load(product_record)
+
+
+def encode_png(pattern: np.ndarray) -> bytes:
+    """Encodes a pattern array as PNG bytes."""
+    ok, buffer = cv2.imencode(".png", pattern)
+    if not ok:
+        raise ValueError("Could not encode pattern as PNG.")
+    return buffer.tobytes()
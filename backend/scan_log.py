@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from decouple import config
+from .database import database, scans
+
+logger = logging.getLogger(__name__)
+
+# --- SCAN LOG ---
+# Every verification is recorded in the scans table. Rows are buffered in
+# memory and written by a background task in one transaction per batch, so a
+# scan never waits on a commit. The cost is that the newest scans (up to one
+# flush interval) are not visible yet, and are lost if the process crashes.
+SCAN_LOG_ENABLED = config("SCAN_LOG_ENABLED", default=True, cast=bool)
+SCAN_LOG_FLUSH_INTERVAL = config("SCAN_LOG_FLUSH_INTERVAL", default=1.0, cast=float)  # Seconds
+SCAN_LOG_BATCH_SIZE = config("SCAN_LOG_BATCH_SIZE", default=1000, cast=int)  # Flush early at this many
+# Beyond this many unwritten scans (e.g. the database is down), new ones are dropped
+SCAN_LOG_MAX_PENDING = config("SCAN_LOG_MAX_PENDING", default=100_000, cast=int)
+
+INSERT_SCANS = (
+    f"INSERT INTO {scans.name} (unique_id, image_hash, status, similarity_score, scanned_at) VALUES (?, ?, ?, ?, ?)"
+)
+
+
+class ScanLog:
+    """A write-behind buffer for scan rows. Only used from the event loop, so it needs no lock."""
+
+    def __init__(self, enabled: bool, flush_interval: float, batch_size: int, max_pending: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending = []
+        self.written = 0
+        self.dropped = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background task and writes whatever is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def record(self, unique_id: Optional[str], image_hash: str, status: str, similarity_score: Optional[float] = None):
+        if self._task is None:
+            return
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        scanned_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())  # Same format as CURRENT_TIMESTAMP
+        self.pending.append((unique_id, image_hash, status, similarity_score, scanned_at))
+        if len(self.pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Writes the buffered scans with one executemany in one transaction."""
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        try:
+            async with database.connection() as connection:
+                async with connection.transaction():
+                    await connection.raw_connection.executemany(INSERT_SCANS, rows)
+        except Exception:
+            # Put them back to retry on the next flush, within the cap
+            restored = rows + self.pending
+            self.pending = restored[: self.max_pending]
+            self.dropped += len(restored) - len(self.pending)
+            raise
+        self.written += len(rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Could not write %d scans; will retry.", len(self.pending))
+
+    def stats(self) -> dict:
+        return {"pending": len(self.pending), "written": self.written, "dropped": self.dropped}
+
+
+scan_log = ScanLog(SCAN_LOG_ENABLED, SCAN_LOG_FLUSH_INTERVAL, SCAN_LOG_BATCH_SIZE, SCAN_LOG_MAX_PENDING)
@@ -1,20 +1,57 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class ProductCreate(BaseModel):
     product_name: str
     company_name: str
 
+class ProductBatchCreate(BaseModel):
+    # Either register `count` copies of `product`, or one product per entry
+    # in `products`.
+    count: Optional[int] = None
+    product: Optional[ProductCreate] = None
+    products: Optional[List[ProductCreate]] = None
+
+class ProductStatusUpdate(BaseModel):
+    is_authentic: bool
+
 class Product(BaseModel):
     id: int
     unique_id: str
     product_name: str
     company_name: str
+    is_authentic: Optional[bool] = None
     # --- PHASE 2 ADDITION ---
     master_pattern_path: Optional[str] = None
+    pattern_mode: Optional[str] = None
 
 class VerificationResponse(BaseModel):
     status: str
     message: str
     similarity_score: Optional[float] = None
-    product_data: Optional[Product] = None
\ No newline at end of file
+    product_data: Optional[Product] = None
+
+class ScanSummary(BaseModel):
+    unique_id: str
+    total_scans: int
+    distinct_images: int  # Different uploaded files, by SHA-256
+    statuses: Dict[str, int]
+    first_scan: Optional[datetime] = None
+    last_scan: Optional[datetime] = None
+    suspected_clone: bool
+
+class CloneSuspect(BaseModel):
+    unique_id: str
+    total_scans: int
+    distinct_images: int
+
+class LiveScanProgress(BaseModel):
+    # Sent after each camera frame on /verify/live until a verdict is reached
+    status: str = "SCANNING"
+    message: str
+    frames: int
+    confidence: Optional[float] = None
+
+class LiveVerificationResponse(VerificationResponse):
+    frames: int  # Camera frames the verdict took
\ No newline at end of file
@@ -0,0 +1,107 @@
+from typing import NamedTuple, Sequence
+import cv2
+import numpy as np
+from decouple import config
+
+# --- SIMILARITY ENGINE ---
+# "ssim" matches skimage.metrics.structural_similarity with its defaults for
+# uint8 images (7x7 uniform window, sample covariance, K1=0.01, K2=0.03,
+# data_range=255). skimage filters the whole image and then discards a
+# 3-pixel border, so only fully in-bounds windows count, and box filtering
+# just those windows over a whole stack of patterns gives identical scores.
+# "ncc" is plain normalised cross-correlation: cheaper, and compared against
+# the same AUTHENTICITY_THRESHOLD.
+SIMILARITY_METHODS = ("ssim", "ncc")
+SIMILARITY_METHOD = config("SIMILARITY_METHOD", default="ssim")
+SSIM_WINDOW = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+SSIM_DATA_RANGE = 255
+
+if SIMILARITY_METHOD not in SIMILARITY_METHODS:
+    raise RuntimeError(f"SIMILARITY_METHOD must be one of {SIMILARITY_METHODS}, got {SIMILARITY_METHOD!r}.")
+
+_N_PIXELS = SSIM_WINDOW * SSIM_WINDOW
+_COV_NORM = _N_PIXELS / (_N_PIXELS - 1)
+_C1 = (SSIM_K1 * SSIM_DATA_RANGE) ** 2
+_C2 = (SSIM_K2 * SSIM_DATA_RANGE) ** 2
+
+
+class MasterStats(NamedTuple):
+    """Everything about a master pattern that scoring needs and that never changes."""
+
+    pattern: np.ndarray  # The master itself, as uint8
+    pixels: np.ndarray  # The master as float64
+    mean: np.ndarray  # Windowed means
+    var: np.ndarray  # Windowed (sample) variances
+    unit: np.ndarray  # Flattened, zero-mean and unit-norm, for NCC
+
+
+def box_means(images: np.ndarray, window: int = SSIM_WINDOW) -> np.ndarray:
+    """Means of every fully in-bounds window x window block of each image in an (N, H, W) stack."""
+    n, h, w = images.shape
+    # Filter the stack as one tall image; the windows kept below never
+    # straddle two images, so the seams don't matter.
+    means = cv2.boxFilter(images.reshape(n * h, w), cv2.CV_64F, (window, window), borderType=cv2.BORDER_REFLECT)
+    pad = window // 2
+    return means.reshape(n, h, w)[:, pad : h - pad, pad : w - pad]
+
+
+def master_stats(pattern: np.ndarray) -> MasterStats:
+    """Precomputes a master pattern's statistics, once, for every later comparison."""
+    pixels = pattern.astype(np.float64)
+    mean, mean_sq = box_means(np.stack([pixels, pixels * pixels]))
+    centred = (pixels - pixels.mean()).ravel()
+    norm = np.linalg.norm(centred)
+    stats = MasterStats(
+        pattern=pattern,
+        pixels=pixels,
+        mean=mean,
+        var=_COV_NORM * (mean_sq - mean * mean),
+        unit=centred / norm if norm else centred,
+    )
+    for array in stats:
+        array.flags.writeable = False  # Shared between requests
+    return stats
+
+
+def ssim_scores(masters: Sequence[MasterStats], patterns: np.ndarray) -> np.ndarray:
+    """Mean SSIM of each (N, H, W) uint8 pattern against its master."""
+    n = len(masters)
+    x = np.stack([m.pixels for m in masters])
+    ux = np.stack([m.mean for m in masters])
+    vx = np.stack([m.var for m in masters])
+
+    # Only the uploaded patch's moments are computed per request
+    y = patterns.astype(np.float64)
+    moments = box_means(np.concatenate([y, y * y, x * y]))
+    uy, uyy, uxy = moments[:n], moments[n : 2 * n], moments[2 * n :]
+    vy = _COV_NORM * (uyy - uy * uy)
+    vxy = _COV_NORM * (uxy - ux * uy)
+
+    s = ((2 * ux * uy + _C1) * (2 * vxy + _C2)) / ((ux * ux + uy * uy + _C1) * (vx + vy + _C2))
+    return s.mean(axis=(1, 2))
+
+
+def ncc_scores(masters: Sequence[MasterStats], patterns: np.ndarray) -> np.ndarray:
+    """Normalised cross-correlation of each (N, H, W) pattern with its master."""
+    y = patterns.reshape(len(patterns), -1).astype(np.float64)
+    y -= y.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(y, axis=1)
+    dots = np.einsum("ij,ij->i", np.stack([m.unit for m in masters]), y)
+    # A flat patch carries no pattern at all
+    scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+    return np.clip(scores, -1.0, 1.0)  # Rounding can land just outside
+
+
+def similarity_scores(masters: Sequence[MasterStats], patterns: np.ndarray) -> np.ndarray:
+    """Scores a stack of extracted patterns against their masters with SIMILARITY_METHOD."""
+    if SIMILARITY_METHOD == "ncc":
+        return ncc_scores(masters, patterns)
+    return ssim_scores(masters, patterns)
+
+
+def compare_patterns(master: MasterStats, extracted_pattern: np.ndarray) -> float:
+    """Scores one extracted pattern against its master."""
+    return float(similarity_scores([master], extracted_pattern[None])[0])
+
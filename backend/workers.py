@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from decouple import config
+
+# --- VERIFICATION WORKERS ---
+# "inline" runs image analysis on the event loop (the original behaviour),
+# "thread" and "process" hand it to a pool so scans use every core and the
+# server stays responsive while they run.
+EXECUTOR_MODES = ("inline", "thread", "process")
+VERIFY_EXECUTOR = config("VERIFY_EXECUTOR", default="thread")
+VERIFY_WORKERS = config("VERIFY_WORKERS", default=os.cpu_count() or 1, cast=int)
+# Jobs allowed to wait for a worker before new ones are turned away
+VERIFY_QUEUE_SIZE = config("VERIFY_QUEUE_SIZE", default=4 * VERIFY_WORKERS, cast=int)
+
+if VERIFY_EXECUTOR not in EXECUTOR_MODES:
+    raise RuntimeError(f"VERIFY_EXECUTOR must be one of {EXECUTOR_MODES}, got {VERIFY_EXECUTOR!r}.")
+
+
+class PoolSaturated(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+def warm_up():
+    """
+    Loads cv2 and zbar and runs the whole pipeline once, so a worker's first
+    real scan doesn't pay for imports and lazy initialisation.
+    """
+    import numpy as np
+    from .imaging import QRDecodeError, analyze_image
+    from .patterns import PATTERN_SIZE, encode_png
+    from .similarity import compare_patterns, master_stats
+
+    blank = np.zeros(PATTERN_SIZE, dtype=np.uint8)
+    try:
+        analyze_image(encode_png(blank))
+    except QRDecodeError:
+        pass
+    compare_patterns(master_stats(blank), blank)
+
+
+class VerificationPool:
+    """Runs CPU-bound verification work with a bounded number of jobs in flight."""
+
+    def __init__(self, mode: str, workers: int, queue_size: int):
+        self.mode = mode
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.executor: Optional[Executor] = None
+
+    def _create_executor(self) -> Executor:
+        if self.mode == "process":
+            # Spawned rather than forked: the server process already runs threads
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up,
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, initializer=warm_up)
+
+    async def start(self):
+        if self.mode == "inline":
+            warm_up()
+            return
+        self.executor = self._create_executor()
+        # Start every worker now rather than on the first burst of scans
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, int) for _ in range(self.workers)))
+
+    def _replace_broken(self, broken: Executor):
+        """
+        Swaps in a new process pool after a worker died (e.g. a native crash
+        on a hostile image), which leaves the old one unusable for good.
+        """
+        if self.executor is broken:  # Not already replaced by another request
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create_executor()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) in the pool, raising PoolSaturated instead of queueing without bound."""
+        if self.executor is None:
+            return fn(*args)
+        if self.in_flight >= self.capacity:
+            raise PoolSaturated()
+        # Only touched from the event loop thread, so no lock is needed
+        self.in_flight += 1
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            raise PoolSaturated()  # Answered like a busy server; the client retries
+        finally:
+            self.in_flight -= 1
+
+    async def run_many(self, fn, items):
+        """
+        Runs fn on every item in the pool, returning results (or the exception
+        raised) in order. A batch is admitted whole while there is spare
+        capacity, and counts against it until every item is done.
+        """
+        items = list(items)
+        if self.executor is None:
+            return [_call(fn, item) for item in items]
+        if self.in_flight >= self.capacity:
+            raise PoolSaturated()
+        self.in_flight += len(items)
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            futures = [loop.run_in_executor(executor, fn, item) for item in items]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+        except BrokenProcessPool:  # Raised by submitting to a pool that is already broken
+            results = [BrokenProcessPool()]
+        finally:
+            self.in_flight -= len(items)
+        if any(isinstance(result, BrokenProcessPool) for result in results):
+            self._replace_broken(executor)
+            raise PoolSaturated()
+        return results
+
+
+def _call(fn, item):
+    try:
+        return fn(item)
+    except Exception as e:
+        return e
+
+
+verification_pool = VerificationPool(VERIFY_EXECUTOR, VERIFY_WORKERS, VERIFY_QUEUE_SIZE)
@@ -0,0 +1,105 @@
+"""
+Synthetic degraded-scan corpus for the verification benchmarks.
+
+Products are registered and their master patterns downloaded through the
+API, labels are rendered with the generator's renderer, and each label is
+then "photographed" under a set of seeded degradations. Every product also
+gets a counterfeit: a label reprinted from a copy of its pattern.
+"""
+import io
+import json
+from typing import Callable, Dict, List, NamedTuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from generator.qr_render import encode_png, render_secure_qr
+
+CAMERA_SCALE = 3.0  # Photo pixels per label pixel
+BACKGROUND = 235  # Gray level around the label in photos
+
+
+class CorpusImage(NamedTuple):
+    name: str
+    unique_id: str
+    degradation: str
+    expected: str  # The verdict a correct verifier returns
+    data: bytes
+
+
+def photograph(label: np.ndarray, rng, angle: float = 0.0, jitter: float = 0.0, scale: float = CAMERA_SCALE) -> np.ndarray:
+    """
+    Places the label on a plain background the way a camera sees it:
+    magnified, rotated by `angle` degrees, and with each corner moved by up to
+    `jitter` of the label's width to simulate perspective.
+    """
+    h, w = label.shape
+    size = int(max(h, w) * scale * 1.6)
+    center = np.float32([size / 2, size / 2])
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    dst = (src - [w / 2, h / 2]) * scale
+    theta = np.deg2rad(angle)
+    rotation = np.float32([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    dst = dst @ rotation.T + center + rng.uniform(-jitter, jitter, (4, 2)) * w * scale
+    warp = cv2.getPerspectiveTransform(src, dst.astype(np.float32))
+    return cv2.warpPerspective(label, warp, (size, size), flags=cv2.INTER_CUBIC, borderValue=BACKGROUND)
+
+
+def encode_jpeg(image: np.ndarray, quality: int) -> bytes:
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def print_and_scan(label: np.ndarray, rng) -> bytes:
+    """Ink spread, a slightly skewed capture, washed-out contrast and sensor noise."""
+    printed = cv2.GaussianBlur(label, (0, 0), 0.2)
+    photo = photograph(printed, rng, angle=rng.uniform(-2, 2)).astype(np.float32)
+    photo = 12 + photo * 0.9 + rng.normal(0, 2, photo.shape)
+    return encode_jpeg(np.clip(photo, 0, 255).astype(np.uint8), 85)
+
+
+# Each degradation turns a rendered label into the bytes a phone would upload.
+# Severities sit where genuine labels start to fall below
+# AUTHENTICITY_THRESHOLD, so changes in accuracy show up in either direction.
+DEGRADATIONS: Dict[str, Callable[[np.ndarray, np.random.Generator], bytes]] = {
+    "clean": lambda label, rng: encode_png(label),
+    "jpeg": lambda label, rng: encode_jpeg(photograph(label, rng), 60),
+    "blur": lambda label, rng: encode_jpeg(cv2.GaussianBlur(photograph(label, rng), (0, 0), 0.5), 90),
+    # Any angle, including sideways and upside down
+    "rotation": lambda label, rng: encode_jpeg(photograph(label, rng, angle=rng.uniform(-180, 180)), 90),
+    "perspective": lambda label, rng: encode_jpeg(photograph(label, rng, jitter=0.03), 90),
+    "print_scan": print_and_scan,
+}
+
+
+def copy_pattern(pattern: np.ndarray, rng) -> np.ndarray:
+    """What a counterfeiter recovers by scanning a genuine label: a blurred, noisy pattern."""
+    copied = cv2.GaussianBlur(pattern, (0, 0), 0.8).astype(np.float32) + rng.normal(0, 8, pattern.shape)
+    return np.clip(copied, 0, 255).astype(np.uint8)
+
+
+async def build_corpus(client, count: int, seed: int) -> List[CorpusImage]:
+    """Registers `count` products through the API and returns their degraded scans plus one counterfeit each."""
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)  # The backend draws file and packed patterns from NumPy's global generator
+    response = await client.post(
+        "/products/batch",
+        json={"count": count, "product": {"product_name": "Benchmark", "company_name": "Benchmark"}},
+    )
+    response.raise_for_status()
+    unique_ids = [json.loads(line)["unique_id"] for line in response.text.splitlines() if line]
+
+    corpus = []
+    for n, unique_id in enumerate(unique_ids):
+        response = await client.get(f"/products/{unique_id}/master_pattern")
+        response.raise_for_status()
+        pattern = np.asarray(Image.open(io.BytesIO(response.content)).convert("L"))
+        label = render_secure_qr(unique_id, pattern)
+
+        for degradation, degrade in DEGRADATIONS.items():
+            ext = "png" if degradation == "clean" else "jpg"
+            corpus.append(CorpusImage(f"{n:04d}_{degradation}.{ext}", unique_id, degradation, "AUTHENTIC", degrade(label, rng)))
+
+        counterfeit = render_secure_qr(unique_id, copy_pattern(pattern, rng))
+        corpus.append(CorpusImage(f"{n:04d}_counterfeit.jpg", unique_id, "counterfeit", "COUNTERFEIT", print_and_scan(counterfeit, rng)))
+    return corpus
@@ -0,0 +1,67 @@
+"""
+Label rendering micro-benchmark: python -m benchmarks.render_bench [--count N]
+
+Compares the old qrcode/Pillow path (make_image, convert to RGB, paste the
+pattern, save) with generator.qr_render, and shows what each PNG
+compression level costs in time and file size.
+"""
+import argparse
+import io
+import time
+import uuid
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+from generator.qr_render import BORDER, BOX_SIZE, ERROR_CORRECTION, QR_VERSION, encode_png, render_secure_qr
+
+
+def legacy_label(unique_id: str, pattern_img: Image.Image) -> bytes:
+    """The rendering path the generator used before qr_render."""
+    qr = qrcode.QRCode(version=QR_VERSION, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER)
+    qr.add_data(unique_id)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+    qr_w, qr_h = qr_img.size
+    p_w, p_h = pattern_img.size
+    qr_img.paste(pattern_img, ((qr_w - p_w) // 2, (qr_h - p_h) // 2))
+    buffer = io.BytesIO()
+    qr_img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def vectorized_label(unique_id: str, pattern_img: Image.Image, compress_level=None) -> bytes:
+    label = render_secure_qr(unique_id, pattern_img)
+    return encode_png(label) if compress_level is None else encode_png(label, compress_level)
+
+
+def bench(name, render, inputs):
+    start = time.perf_counter()
+    sizes = [len(render(unique_id, pattern)) for unique_id, pattern in inputs]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(inputs) / elapsed:>9.0f} codes/s {np.mean(sizes) / 1024:>8.1f} KiB/code")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="Labels rendered per variant.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    inputs = [
+        (str(uuid.UUID(int=int(rng.integers(2**63)))), Image.fromarray(rng.integers(0, 256, (48, 48), dtype=np.uint8)))
+        for _ in range(args.count)
+    ]
+
+    for unique_id, pattern in inputs[:50]:
+        legacy = np.array(Image.open(io.BytesIO(legacy_label(unique_id, pattern))).convert("L"))
+        assert np.array_equal(legacy, render_secure_qr(unique_id, pattern)), f"Renderers disagree on {unique_id}"
+
+    print(f"{args.count} labels, single thread")
+    baseline = bench("legacy (RGB + paste)", legacy_label, inputs)
+    current = bench("qr_render (default level)", vectorized_label, inputs)
+    for level in (0, 3, 6, 9):
+        bench(f"qr_render (level {level})", lambda u, p, level=level: vectorized_label(u, p, level), inputs)
+    print(f"Speed-up at the default level: {baseline / current:.1f}x")
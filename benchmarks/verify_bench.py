@@ -0,0 +1,273 @@
+"""
+Verification benchmark: python -m benchmarks.verify_bench [--baseline old.json]
+
+Builds a synthetic corpus of degraded scans (benchmarks/corpus.py) against
+a scratch database, times each stage of the verification pipeline, then
+drives POST /verify/image in-process at several concurrency levels. Results
+are written as JSON; with --baseline, they are compared against an earlier
+run and the exit status is 1 if anything regressed past the thresholds.
+
+Backend settings (PATTERN_MODE, SIMILARITY_METHOD, VERIFY_EXECUTOR, ...) are
+read from the environment as usual and recorded with the results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+RETRY_PAUSE = 0.01  # Seconds before resending a scan the server turned away with 503
+STAGES = ("decode", "extract", "db_lookup", "pattern_load", "similarity")
+
+
+def use_scratch_storage(workdir: str):
+    """Points the backend at a throwaway database and pattern store. Must run before backend is imported."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["MASTER_PATTERN_DIR"] = os.path.join(workdir, "master_patterns")
+    os.environ["PACKED_PATTERN_FILE"] = os.path.join(workdir, "master_patterns.bin")
+    # Repeat passes upload identical bytes; time the pipeline, not the verdict cache
+    os.environ.setdefault("VERDICT_CACHE_SIZE", "0")
+    if os.environ.get("PATTERN_MODE") == "keyed":
+        os.environ.setdefault("PATTERN_SECRET", "benchmark")
+
+
+def summarize(seconds) -> dict:
+    ms = np.asarray(seconds) * 1000
+    if not ms.size:
+        return {"count": 0}
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+    }
+
+
+async def time_stages(corpus) -> dict:
+    """Runs each pipeline stage by hand, one image at a time and without the product cache."""
+    from backend.database import database, products
+    from backend.imaging import QRDecodeError, decode_grayscale, extract_pattern, find_qr_code
+    from backend.patterns import load_master_pattern
+    from backend.similarity import compare_patterns, master_stats
+
+    timings = defaultdict(list)
+    for image in corpus:
+        start = time.perf_counter()
+        try:
+            gray = decode_grayscale(image.data)
+            symbol, polygon = find_qr_code(gray)
+        except QRDecodeError:
+            continue
+        decoded = time.perf_counter()
+        unique_id = symbol.data.decode("utf-8", errors="replace")
+        try:
+            pattern = extract_pattern(gray, polygon, unique_id, symbol.orientation)
+        except Exception:
+            continue
+        extracted = time.perf_counter()
+        record = await database.fetch_one(products.select().where(products.c.unique_id == unique_id))
+        looked_up = time.perf_counter()
+        if record is None:
+            continue
+        master = master_stats(load_master_pattern(dict(record._mapping)))
+        loaded = time.perf_counter()
+        compare_patterns(master, pattern)
+        compared = time.perf_counter()
+
+        for stage, seconds in zip(STAGES, np.diff([start, decoded, extracted, looked_up, loaded, compared])):
+            timings[stage].append(seconds)
+    return {stage: summarize(timings[stage]) for stage in STAGES}
+
+
+async def drive(client, corpus, concurrency: int, repeat: int):
+    """Verifies the corpus `repeat` times through the API with `concurrency` requests in flight."""
+    jobs = iter([image for _ in range(repeat) for image in corpus])
+    latencies, responses = [], []
+    rejected = 0
+
+    async def worker():
+        nonlocal rejected
+        for image in jobs:
+            start = time.perf_counter()
+            while True:
+                response = await client.post("/verify/image", files={"file": (image.name, image.data)})
+                if response.status_code != 503:
+                    break
+                rejected += 1
+                await asyncio.sleep(RETRY_PAUSE)
+            latencies.append(time.perf_counter() - start)
+            responses.append((image, response))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    level = {"images_per_s": len(latencies) / elapsed, "rejected": rejected, **summarize(latencies)}
+    return level, responses
+
+
+def score_accuracy(responses) -> dict:
+    """Per degradation: how often the verdict was the expected one, and the similarity scores seen."""
+    groups = defaultdict(list)
+    for image, response in responses:
+        groups[image.degradation].append((image, response))
+
+    accuracy = {}
+    for degradation, results in groups.items():
+        statuses = Counter()
+        scores = []
+        for image, response in results:
+            data = response.json() if response.status_code == 200 else {}
+            statuses[data.get("status", f"HTTP {response.status_code}")] += 1
+            if data.get("similarity_score") is not None:
+                scores.append(data["similarity_score"])
+        expected = results[0][0].expected
+        accuracy[degradation] = {
+            "expected": expected,
+            "accuracy": statuses[expected] / len(results),
+            "mean_score": float(np.mean(scores)) if scores else None,
+            "statuses": dict(statuses),
+        }
+    return accuracy
+
+
+def describe_run(args) -> dict:
+    from backend.patterns import PATTERN_MODE
+    from backend.similarity import SIMILARITY_METHOD
+    from backend.workers import VERIFY_EXECUTOR, VERIFY_WORKERS
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "products": args.products,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "pattern_mode": PATTERN_MODE,
+        "similarity_method": SIMILARITY_METHOD,
+        "verify_executor": VERIFY_EXECUTOR,
+        "verify_workers": VERIFY_WORKERS,
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    from backend import main
+    from .corpus import build_corpus
+
+    await main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            print(f"Building corpus from {args.products} products...")
+            corpus = await build_corpus(client, args.products, args.seed)
+            if args.save_corpus:
+                os.makedirs(args.save_corpus, exist_ok=True)
+                for image in corpus:
+                    with open(os.path.join(args.save_corpus, image.name), "wb") as f:
+                        f.write(image.data)
+
+            print(f"Timing pipeline stages over {len(corpus)} images...")
+            stages = await time_stages(corpus)
+
+            throughput = {}
+            accuracy = None
+            for concurrency in args.concurrency:
+                main.product_cache.clear()  # Every level starts cold
+                print(f"Verifying at concurrency {concurrency}...")
+                throughput[str(concurrency)], responses = await drive(client, corpus, concurrency, args.repeat)
+                if accuracy is None:
+                    accuracy = score_accuracy(responses)
+    finally:
+        await main.shutdown()
+
+    return {"meta": describe_run(args), "stages": stages, "throughput": throughput, "accuracy": accuracy}
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float, max_accuracy_drop: float) -> list:
+    """Returns a description of every metric that regressed past its threshold."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        before = baseline["stages"].get(stage, {})
+        if "p50_ms" in current and "p50_ms" in before and current["p50_ms"] > before["p50_ms"] * (1 + max_slowdown):
+            regressions.append(f"{stage} p50 {before['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+    for level, current in results["throughput"].items():
+        before = baseline["throughput"].get(level)
+        if before and current["images_per_s"] < before["images_per_s"] * (1 - max_slowdown):
+            regressions.append(
+                f"throughput at concurrency {level} {before['images_per_s']:.1f} -> {current['images_per_s']:.1f} images/s"
+            )
+    for degradation, current in results["accuracy"].items():
+        before = baseline["accuracy"].get(degradation)
+        if before and current["accuracy"] < before["accuracy"] - max_accuracy_drop:
+            regressions.append(f"{degradation} accuracy {before['accuracy']:.1%} -> {current['accuracy']:.1%}")
+    return regressions
+
+
+def report(results: dict):
+    print("\n--- STAGES (ms, single image, cold) ---")
+    for stage, summary in results["stages"].items():
+        if summary["count"]:
+            print(f"{stage:<14} p50 {summary['p50_ms']:8.2f}  p95 {summary['p95_ms']:8.2f}  mean {summary['mean_ms']:8.2f}")
+    print("\n--- END TO END (POST /verify/image) ---")
+    for level, summary in results["throughput"].items():
+        print(
+            f"concurrency {level:>3}: {summary['images_per_s']:7.1f} images/s  "
+            f"p50 {summary['p50_ms']:7.1f} ms  p95 {summary['p95_ms']:7.1f} ms  rejected {summary['rejected']}"
+        )
+    print("\n--- ACCURACY ---")
+    for degradation, summary in results["accuracy"].items():
+        score = f"{summary['mean_score']:.3f}" if summary["mean_score"] is not None else "  -  "
+        print(f"{degradation:<12} {summary['accuracy']:6.1%} {summary['expected']:<12} mean score {score}  {summary['statuses']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=40, help="Products in the corpus (7 images each).")
+    parser.add_argument("--seed", type=int, default=0, help="Seeds the degradations.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Requests in flight.")
+    parser.add_argument("--repeat", type=int, default=2, help="Passes over the corpus per concurrency level.")
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/<commit>.json).")
+    parser.add_argument("--baseline", help="Earlier results to compare against.")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="Allowed fractional slowdown per metric.")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.05, help="Allowed drop in accuracy per degradation.")
+    parser.add_argument("--save-corpus", help="Also write the corpus images to this directory.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="safe-qr-bench-")
+    try:
+        use_scratch_storage(workdir)
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    output = args.output or os.path.join("benchmarks", "results", f"{results['meta']['commit'] or 'latest'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown, args.max_accuracy_drop)
+        if regressions:
+            print("\n[REGRESSION] " + "\n[REGRESSION] ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
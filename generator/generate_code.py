@@ -1,9 +1,18 @@
+import argparse
+import concurrent.futures
+import csv
+import json
 import requests
-import qrcode
 import os
+import re
+import threading
+import numpy as np
+from requests.adapters import HTTPAdapter
 from PIL import Image
 import io
 
+from qr_render import render_secure_qr, save_png
+
 # Ensure the output directory exists
 output_dir = "generator/generated_qrcodes"
 os.makedirs(output_dir, exist_ok=True)
@@ -11,6 +20,16 @@ os.makedirs(output_dir, exist_ok=True)
 API_URL = "http://127.0.0.1:8000"
 PATTERN_SIZE = (48, 48)  # Must match the backend
 
+# --- PRINT RUNS ---
+REGISTER_CHUNK_SIZE = 1000  # Products registered per /products/batch request
+PROGRESS_FILE = "registered.jsonl"  # Per output directory, makes runs resumable
+
+
+def filename_part(name: str) -> str:
+    """Makes a product name safe to put in a file name on any OS (no '/', '\\', ':' etc.)."""
+    return re.sub(r"[^\w.-]", "_", name)
+
+
 def generate_new_product_qr():
     print("--- Creating a new Secure QR Code (Phase 2) ---")
     product_name = input("Enter the product name: ")
@@ -32,22 +51,13 @@ def generate_new_product_qr():
         pattern_img = Image.open(io.BytesIO(response_pattern.content))
         print("[SUCCESS] Master security pattern downloaded.")
 
-        # 3. Generate the base QR code
-        qr = qrcode.QRCode(version=3, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
-        qr.add_data(unique_id)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white").convert('RGB')
-
-        # 4. Embed the pattern into the center of the QR code
-        qr_w, qr_h = qr_img.size
-        p_w, p_h = pattern_img.size
-        position = ((qr_w - p_w) // 2, (qr_h - p_h) // 2)
-        qr_img.paste(pattern_img, position)
+        # 3. Generate the base QR code and embed the pattern into its center
+        qr_img = render_secure_qr(unique_id, pattern_img)
         
-        # 5. Save the final composite QR code image
-        filename = f"SECURE_{product_name.replace(' ', '_')}_{unique_id[:8]}.png"
+        # 4. Save the final composite QR code image
+        filename = f"SECURE_{filename_part(product_name)}_{unique_id[:8]}.png"
         filepath = os.path.join(output_dir, filename)
-        qr_img.save(filepath)
+        save_png(qr_img, filepath)
         
         print(f"[SUCCESS] Secure QR Code image saved to: {filepath}")
         
@@ -56,5 +66,186 @@ def generate_new_product_qr():
     except Exception as e:
         print(f"\n[ERROR] An unexpected error occurred: {e}")
 
+
+def read_manifest(path: str) -> list:
+    """
+    Reads a CSV or JSONL manifest with product_name, company_name and an
+    optional quantity column, and returns one (product_name, company_name)
+    entry per label to print.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    labels = []
+    for row in rows:
+        quantity = int(row.get("quantity") or 1)
+        labels.extend([(row["product_name"], row["company_name"])] * quantity)
+    return labels
+
+
+def make_session(concurrency: int) -> requests.Session:
+    """A Session whose connection pool can serve every concurrent request."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def save_atomically(image: np.ndarray, filepath: str):
+    """Saves via a temporary file, so an interrupted run never leaves a half-written PNG."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_path = filepath + ".tmp"
+    save_png(image, tmp_path)
+    os.replace(tmp_path, filepath)
+
+
+def render_label(unique_id: str, pattern_png: bytes, filepath: str) -> str:
+    """Renders one secure QR code to filepath. Runs in a worker process."""
+    save_atomically(render_secure_qr(unique_id, Image.open(io.BytesIO(pattern_png))), filepath)
+    return filepath
+
+
+def render_sheet(entries: list, columns: int, rows: int, filepath: str) -> str:
+    """
+    Renders up to columns x rows secure QR codes onto one print-ready sheet,
+    filled row by row. Runs in a worker process.
+    """
+    labels = [render_secure_qr(unique_id, Image.open(io.BytesIO(png))) for unique_id, png in entries]
+    label_h, label_w = labels[0].shape
+    sheet = np.full((rows * label_h, columns * label_w), 255, dtype=np.uint8)
+    for i, label in enumerate(labels):
+        top, left = (i // columns) * label_h, (i % columns) * label_w
+        sheet[top : top + label_h, left : left + label_w] = label
+    save_atomically(sheet, filepath)
+    return filepath
+
+
+def load_progress(progress_path: str) -> dict:
+    """Returns {label index: unique_id} for labels registered by earlier runs."""
+    registered = {}
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # A line cut short by an interruption
+                registered[entry["index"]] = entry["unique_id"]
+    return registered
+
+
+def register_labels(session, labels, registered, progress_path, concurrency):
+    """Registers every label not yet in `registered`, recording each one as it completes."""
+    pending = [i for i in range(len(labels)) if i not in registered]
+    chunks = [pending[i : i + REGISTER_CHUNK_SIZE] for i in range(0, len(pending), REGISTER_CHUNK_SIZE)]
+    lock = threading.Lock()
+
+    def register_chunk(indices):
+        payload = {"products": [{"product_name": labels[i][0], "company_name": labels[i][1]} for i in indices]}
+        response = session.post(f"{API_URL}/products/batch", json=payload)
+        response.raise_for_status()
+        created = [json.loads(line) for line in response.iter_lines() if line]
+        with lock, open(progress_path, "a") as progress:
+            for index, product in zip(indices, created):
+                registered[index] = product["unique_id"]
+                progress.write(json.dumps({"index": index, "unique_id": product["unique_id"]}) + "\n")
+        return len(created)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for count in pool.map(register_chunk, chunks):
+            print(f"[REGISTERED] {count} products ({len(registered)}/{len(labels)})")
+
+
+def download_pattern(session, unique_id: str) -> bytes:
+    response = session.get(f"{API_URL}/products/{unique_id}/master_pattern")
+    response.raise_for_status()
+    return response.content
+
+
+def run_print_run(manifest, run_dir, concurrency, workers, shard_size, sheet):
+    """
+    Registers, downloads and renders every label in a manifest. Re-running
+    with the same output directory resumes: registered labels are not
+    registered again and finished images are not rendered again.
+    """
+    labels = read_manifest(manifest)
+    os.makedirs(run_dir, exist_ok=True)
+    progress_path = os.path.join(run_dir, PROGRESS_FILE)
+    registered = load_progress(progress_path)
+    session = make_session(concurrency)
+
+    print(f"--- Print run: {len(labels)} labels, {len(registered)} already registered ---")
+    register_labels(session, labels, registered, progress_path, concurrency)
+
+    # One job per output image: (filepath, [(index, unique_id), ...])
+    jobs = []
+    if sheet:
+        columns, rows = sheet
+        per_sheet = columns * rows
+        for start in range(0, len(labels), per_sheet):
+            filepath = os.path.join(run_dir, "sheets", f"sheet_{start // per_sheet:05d}.png")
+            jobs.append((filepath, [(i, registered[i]) for i in range(start, min(start + per_sheet, len(labels)))]))
+    else:
+        for i in range(len(labels)):
+            name = filename_part(labels[i][0])
+            filepath = os.path.join(run_dir, f"shard_{i // shard_size:04d}", f"SECURE_{name}_{registered[i]}.png")
+            jobs.append((filepath, [(i, registered[i])]))
+    jobs = [job for job in jobs if not os.path.exists(job[0])]
+    print(f"--- Rendering {len(jobs)} images ---")
+
+    def fetch(job):
+        filepath, entries = job
+        return filepath, [(unique_id, download_pattern(session, unique_id)) for _, unique_id in entries]
+
+    done = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as renderers:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as downloaders:
+            renders = []
+            for filepath, entries in downloaders.map(fetch, jobs):
+                if sheet:
+                    renders.append(renderers.submit(render_sheet, entries, columns, rows, filepath))
+                else:
+                    renders.append(renderers.submit(render_label, *entries[0], filepath))
+        for future in concurrent.futures.as_completed(renders):
+            future.result()
+            done += 1
+            if done % 1000 == 0 or done == len(renders):
+                print(f"[RENDERED] {done}/{len(renders)}")
+
+    print(f"[SUCCESS] Print run saved to: {run_dir}")
+
+
+def parse_sheet(value: str):
+    columns, rows = value.lower().split("x")
+    return int(columns), int(rows)
+
+
 if __name__ == "__main__":
-    generate_new_product_qr()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create secure QR codes, interactively or for a whole print run.")
+    parser.add_argument("--manifest", help="CSV or JSONL file with product_name, company_name and optional quantity.")
+    parser.add_argument("--output-dir", help="Where to write the print run (default: next to the single-code output).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent API requests.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes rendering images.")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Labels per output subdirectory.")
+    parser.add_argument("--sheet", type=parse_sheet, help="Render multi-up print sheets instead, e.g. 4x6.")
+    args = parser.parse_args()
+
+    if args.manifest:
+        run_name = os.path.splitext(os.path.basename(args.manifest))[0]
+        try:
+            run_print_run(
+                args.manifest,
+                args.output_dir or os.path.join(output_dir, run_name),
+                args.concurrency,
+                args.workers,
+                args.shard_size,
+                args.sheet,
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERROR] API request failed: {e}. Re-run the same command to resume.")
+    else:
+        generate_new_product_qr()
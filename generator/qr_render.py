@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+# --- Label layout (must match what the backend expects to find) ---
+QR_VERSION = 3
+ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_H  # Leaves room for the pattern
+BOX_SIZE = 10
+BORDER = 4
+
+# Labels are flat runs around an incompressible noise pattern: zlib level 3
+# encodes them in about 60% of the time of Pillow's default (6) for files
+# about 30% larger, while level 9 takes three times as long to save 10%.
+PNG_COMPRESS_LEVEL = 3
+
+
+def qr_modules(data: str, version: int = QR_VERSION, error_correction=ERROR_CORRECTION, border: int = BORDER) -> np.ndarray:
+    """Returns the QR code's module grid, quiet zone included, as a bool array (True = dark)."""
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def render_modules(modules: np.ndarray, box_size: int = BOX_SIZE) -> np.ndarray:
+    """Upscales a module grid into a grayscale (uint8) image, black on white."""
+    pixels = np.where(modules, np.uint8(0), np.uint8(255))
+    return pixels.repeat(box_size, axis=0).repeat(box_size, axis=1)
+
+
+def composite_pattern(label: np.ndarray, pattern: np.ndarray) -> np.ndarray:
+    """Writes the pattern into the center of the label in place and returns the label."""
+    p_h, p_w = pattern.shape
+    top = (label.shape[0] - p_h) // 2
+    left = (label.shape[1] - p_w) // 2
+    label[top : top + p_h, left : left + p_w] = pattern
+    return label
+
+
+def render_secure_qr(data: str, pattern, box_size: int = BOX_SIZE) -> np.ndarray:
+    """Renders the QR code for data with the security pattern embedded in its center."""
+    pattern = np.asarray(pattern, dtype=np.uint8)  # Also accepts a grayscale PIL image
+    return composite_pattern(render_modules(qr_modules(data), box_size), pattern)
+
+
+def to_image(label: np.ndarray) -> Image.Image:
+    return Image.fromarray(label)  # 2-D uint8 -> mode "L"
+
+
+def encode_png(label: np.ndarray, compress_level: int = PNG_COMPRESS_LEVEL) -> bytes:
+    buffer = io.BytesIO()
+    to_image(label).save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def save_png(label: np.ndarray, filepath: str, compress_level: int = PNG_COMPRESS_LEVEL):
+    to_image(label).save(filepath, format="PNG", compress_level=compress_level)
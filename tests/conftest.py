@@ -0,0 +1,41 @@
+import asyncio
+import os
+import random
+import tempfile
+import uuid
+
+import pytest
+
+# The backend reads its settings when it is first imported, so point it at
+# scratch storage before any test module imports it.
+_workdir = tempfile.mkdtemp(prefix="safe-qr-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["MASTER_PATTERN_DIR"] = os.path.join(_workdir, "master_patterns")
+os.environ["PACKED_PATTERN_FILE"] = os.path.join(_workdir, "master_patterns.bin")
+
+
+@pytest.fixture
+def entry():
+    """A product to register."""
+    from backend.schemas import ProductCreate
+
+    return ProductCreate(product_name="Test", company_name="Test")
+
+
+@pytest.fixture
+def fresh_registration_lock(monkeypatch):
+    """Gives backend.main a registration lock bound to this test's event loop; each test runs its own."""
+    from backend import main
+
+    monkeypatch.setattr(main, "registration_lock", asyncio.Lock())
+
+
+@pytest.fixture
+def stable_unique_ids(request, monkeypatch):
+    """Registers products under codes that are the same on every run, seeded by the test's name."""
+    from backend import main
+
+    ids = random.Random(request.node.nodeid)
+    monkeypatch.setattr(
+        main, "generate_unique_ids", lambda count: [str(uuid.UUID(int=ids.getrandbits(128), version=4)) for _ in range(count)]
+    )
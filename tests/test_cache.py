@@ -0,0 +1,49 @@
+from backend.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_put_is_skipped_after_invalidate():
+    cache = LRUCache(10)
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
+
+    cache.put("a", "fresh", cache.generation("a"))
+    assert cache.get("a") == "fresh"
+
+
+def test_put_is_skipped_after_clear():
+    cache = LRUCache(10)
+    generation = cache.generation("a")
+    cache.clear()
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
+
+
+def test_other_keys_are_unaffected_by_invalidate():
+    cache = LRUCache(10)
+    generation = cache.generation("a")
+    cache.invalidate("b")
+    cache.put("a", 1, generation)
+    assert cache.get("a") == 1
+
+
+def test_invalidated_keys_are_bounded_without_letting_stale_puts_through():
+    cache = LRUCache(2)
+    generation = cache.generation("a")
+    for key in ["a", "b", "c", "d"]:
+        cache.invalidate(key)
+    assert len(cache._generations) <= 2
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
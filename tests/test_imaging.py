@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # Needs the zbar library
+
+from backend.imaging import analyze_image, symbol_size
+from backend.similarity import compare_patterns, master_stats
+from benchmarks.corpus import encode_jpeg, photograph
+from generator.qr_render import BORDER, BOX_SIZE, encode_png, qr_modules, render_secure_qr
+
+UNIQUE_ID = "3f2b6a1c-8d4e-4f5a-9b7c-0e1d2c3b4a59"
+
+
+@pytest.fixture(scope="module")
+def label():
+    pattern = np.random.default_rng(0).integers(0, 256, (48, 48), dtype=np.uint8)
+    return pattern, render_secure_qr(UNIQUE_ID, pattern)
+
+
+@pytest.mark.parametrize("quarter_turns", [0, 1, 2, 3])
+def test_pattern_is_extracted_upright_from_turned_labels(label, quarter_turns):
+    pattern, image = label
+    analysis = analyze_image(encode_png(np.ascontiguousarray(np.rot90(image, quarter_turns))))
+    assert analysis.unique_id == UNIQUE_ID
+    assert compare_patterns(master_stats(pattern), analysis.pattern) > 0.99
+
+
+@pytest.mark.parametrize("angle", [-150, -100, -35, 60, 120, 175])
+def test_pattern_is_extracted_from_photos_at_any_angle(label, angle):
+    pattern, image = label
+    photo = photograph(image, np.random.default_rng(0), angle=angle)
+    analysis = analyze_image(encode_jpeg(photo, 95))
+    assert analysis.unique_id == UNIQUE_ID
+    assert compare_patterns(master_stats(pattern), analysis.pattern) > 0.9
+
+
+@pytest.mark.parametrize("data", ["abc", UNIQUE_ID, "x" * 60])
+def test_symbol_size_matches_the_generated_symbol(data):
+    assert symbol_size(data) == (len(qr_modules(data)) - 2 * BORDER) * BOX_SIZE
@@ -0,0 +1,17 @@
+import numpy as np
+
+from backend.patterns import PATTERN_SIZE, PackedPatternStore, generate_patterns
+
+
+def test_packed_records_are_written_in_place_at_their_ids(tmp_path):
+    store = PackedPatternStore(str(tmp_path / "patterns.bin"))
+    first = generate_patterns(3)
+    store.write([1, 2, 5], first)  # Two runs, leaving a gap
+    second = generate_patterns(1)
+    store.write([2], second)  # Overwrites one record without truncating the rest
+
+    assert (tmp_path / "patterns.bin").stat().st_size == 6 * PackedPatternStore.RECORD_SIZE
+    assert np.array_equal(store.load({"id": 1}), first[0])
+    assert np.array_equal(store.load({"id": 2}), second[0])
+    assert np.array_equal(store.load({"id": 5}), first[2])
+    assert np.array_equal(store.load({"id": 3}), np.zeros(PATTERN_SIZE, np.uint8))
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # backend.main reads QR codes with zbar
+
+from backend import main
+from backend.database import database
+from backend.patterns import load_master_pattern
+from backend.schemas import ProductStatusUpdate
+from generator.qr_render import encode_png, render_secure_qr
+
+pytestmark = pytest.mark.usefixtures("fresh_registration_lock")
+
+
+def test_revocation_during_a_lookup_is_not_undone_by_the_cache(entry, monkeypatch):
+    async def revoke_during_lookup():
+        await database.connect()
+        try:
+            (record,) = await main.register_products([entry])
+            unique_id = record["unique_id"]
+
+            # Hold a lookup between reading the row and caching it
+            fetched, release = asyncio.Event(), asyncio.Event()
+            fetch_all = database.fetch_all
+
+            async def slow_fetch_all(query):
+                rows = await fetch_all(query)
+                fetched.set()
+                await release.wait()
+                return rows
+
+            monkeypatch.setattr(database, "fetch_all", slow_fetch_all)
+            lookup = asyncio.create_task(main.get_product(unique_id))
+            await fetched.wait()
+            monkeypatch.setattr(database, "fetch_all", fetch_all)
+
+            await main.update_product_status(unique_id, ProductStatusUpdate(is_authentic=False))
+            release.set()
+            stale = await lookup
+            return stale, await main.get_product(unique_id)
+        finally:
+            await database.disconnect()
+
+    stale, product = asyncio.run(revoke_during_lookup())
+
+    assert stale.record["is_authentic"] is True  # Read before the revocation
+    assert product.record["is_authentic"] is False
+
+
+def test_revocation_during_a_verification_is_not_undone_by_the_verdict_cache(entry, stable_unique_ids, monkeypatch):
+    async def revoke_during_verification():
+        await main.startup()
+        try:
+            (record,) = await main.register_products([entry])
+            unique_id = record["unique_id"]
+            label = encode_png(render_secure_qr(unique_id, load_master_pattern(record)))
+
+            # Hold a verification between looking up the product and caching its verdict
+            looked_up, release = asyncio.Event(), asyncio.Event()
+            get_product = main.get_product
+
+            async def slow_get_product(unique_id):
+                product = await get_product(unique_id)
+                looked_up.set()
+                await release.wait()
+                return product
+
+            monkeypatch.setattr(main, "get_product", slow_get_product)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                verification = asyncio.create_task(client.post("/verify/image", files={"file": ("label.png", label)}))
+                await looked_up.wait()
+                monkeypatch.setattr(main, "get_product", get_product)
+
+                response = await client.patch(f"/products/{unique_id}", json={"is_authentic": False})
+                response.raise_for_status()
+                release.set()
+                before = (await verification).json()
+                after = (await client.post("/verify/image", files={"file": ("label.png", label)})).json()
+            return before, after
+        finally:
+            await main.shutdown()
+
+    before, after = asyncio.run(revoke_during_verification())
+
+    assert before["status"] == "AUTHENTIC"  # Looked up before the revocation
+    assert after["status"] == "COUNTERFEIT"
+
+
+def test_status_updates_only_invalidate_caches_for_real_changes(entry):
+    with TestClient(main.app) as client:
+        unique_id = client.post("/products/", json=entry.model_dump()).json()["unique_id"]
+        main.verdict_cache.put("image", (unique_id, None))
+
+        assert client.patch("/products/unknown", json={"is_authentic": False}).status_code == 404
+        assert client.patch(f"/products/{unique_id}", json={"is_authentic": True}).status_code == 200
+        assert main.verdict_cache.get("image") is not None
+        assert "unknown" not in main.product_cache._generations
+
+        response = client.patch(f"/products/{unique_id}", json={"is_authentic": False})
+        assert response.json()["is_authentic"] is False
+        assert main.verdict_cache.get("image") is None
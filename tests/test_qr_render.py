@@ -0,0 +1,18 @@
+import numpy as np
+import qrcode
+from PIL import Image
+
+from generator.qr_render import BORDER, BOX_SIZE, ERROR_CORRECTION, QR_VERSION, render_secure_qr
+
+
+def test_label_matches_qrcode_image_with_pasted_pattern():
+    unique_id = "3f2b6a1c-8d4e-4f5a-9b7c-0e1d2c3b4a59"
+    pattern = np.random.default_rng(0).integers(0, 256, (48, 48), dtype=np.uint8)
+
+    qr = qrcode.QRCode(version=QR_VERSION, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER)
+    qr.add_data(unique_id)
+    qr.make(fit=True)
+    expected = qr.make_image(fill_color="black", back_color="white").convert("L")
+    expected.paste(Image.fromarray(pattern), ((expected.width - 48) // 2, (expected.height - 48) // 2))
+
+    assert np.array_equal(render_secure_qr(unique_id, pattern), np.asarray(expected))
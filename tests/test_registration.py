@@ -0,0 +1,93 @@
+import asyncio
+
+import numpy as np
+import pytest
+import sqlalchemy
+from fastapi import HTTPException
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # backend.main reads QR codes with zbar
+
+from backend import main
+from backend.database import database, products
+from backend.patterns import PATTERN_STORES, generate_patterns
+from backend.schemas import ProductBatchCreate
+
+pytestmark = pytest.mark.usefixtures("fresh_registration_lock")
+
+
+@pytest.fixture
+def packed_store(monkeypatch):
+    """Registers into the packed store and returns {unique_id: the pattern generated for it}."""
+    store = PATTERN_STORES["packed"]
+    generated = {}
+
+    def create(ids, unique_ids):
+        patterns = generate_patterns(len(ids))
+        store.write(ids, patterns)
+        generated.update(zip(unique_ids, patterns))
+        return [None] * len(ids)
+
+    monkeypatch.setattr(store, "create", create)
+    monkeypatch.setattr(main, "pattern_store", store)
+    monkeypatch.setattr(main, "PATTERN_MODE", "packed")
+    return generated
+
+
+def test_concurrent_registrations_get_distinct_ids_and_keep_their_patterns(packed_store, entry):
+    async def register_concurrently():
+        await database.connect()
+        try:
+            # Single creates and batches, all in flight at once
+            requests = [[entry]] * 32 + [[entry] * 50] * 4
+            results = await asyncio.gather(*(main.register_products(entries) for entries in requests))
+            rows = await database.fetch_all(products.select())
+        finally:
+            await database.disconnect()
+        return results, [dict(row._mapping) for row in rows]
+
+    results, rows = asyncio.run(register_concurrently())
+
+    registered = [record for records in results for record in records]
+    assert len(registered) == 32 + 4 * 50
+    assert len({record["id"] for record in registered}) == len(registered)
+    committed = {row["unique_id"]: row for row in rows}
+    for record in registered:
+        row = committed[record["unique_id"]]
+        assert row["id"] == record["id"]
+        assert np.array_equal(PATTERN_STORES["packed"].load(row), packed_store[record["unique_id"]])
+
+
+def test_failed_registration_rolls_back_and_frees_its_ids(packed_store, entry, monkeypatch):
+    async def register_with_one_failure():
+        await database.connect()
+        try:
+            insert_many = main.insert_many
+
+            async def fail_once(rows):
+                monkeypatch.setattr(main, "insert_many", insert_many)
+                await insert_many(rows)
+                raise RuntimeError("Simulated failure after inserting")
+
+            monkeypatch.setattr(main, "insert_many", fail_once)
+            with pytest.raises(RuntimeError):
+                await main.register_products([entry] * 3)
+            (record,) = await main.register_products([entry])
+            row = await database.fetch_one(products.select().where(products.c.unique_id == record["unique_id"]))
+            count = await database.fetch_val(sqlalchemy.select(sqlalchemy.func.count()).select_from(products))
+        finally:
+            await database.disconnect()
+        return record, dict(row._mapping), count
+
+    record, row, count = asyncio.run(register_with_one_failure())
+
+    assert row["id"] == record["id"]
+    assert np.array_equal(PATTERN_STORES["packed"].load(row), packed_store[record["unique_id"]])
+    assert count == record["id"]  # No rows from the failed batch, and no gap in the ids
+
+
+@pytest.mark.parametrize("count", [0, -1, main.MAX_BATCH_SIZE + 1, 10**12])
+def test_batch_count_is_bounded_before_expanding(count, entry):
+    batch = ProductBatchCreate(count=count, product=entry)
+    with pytest.raises(HTTPException) as error:
+        main.expand_batch(batch)
+    assert error.value.status_code == 422
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from skimage.metrics import structural_similarity
+
+from backend.similarity import master_stats, ncc_scores, ssim_scores
+
+
+@pytest.fixture(scope="module")
+def pairs():
+    """Masters and noisy copies of them at a range of noise levels, with every fourth replaced by a counterfeit."""
+    rng = np.random.default_rng(0)
+    masters = rng.integers(0, 256, (200, 48, 48), dtype=np.uint8)
+    noise = rng.normal(0, rng.uniform(0, 80, (200, 1, 1)), masters.shape)
+    patterns = np.clip(masters + noise, 0, 255).astype(np.uint8)
+    patterns[::4] = rng.integers(0, 256, patterns[::4].shape, dtype=np.uint8)
+    patterns[1] = 128  # A flat patch
+    return masters, patterns
+
+
+def test_ssim_matches_skimage(pairs):
+    masters, patterns = pairs
+    expected = [structural_similarity(master, pattern) for master, pattern in zip(masters, patterns)]
+    scores = ssim_scores([master_stats(master) for master in masters], patterns)
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9)
+
+
+def test_ncc_matches_pearson_correlation(pairs):
+    masters, patterns = pairs
+    expected = [
+        np.corrcoef(master.ravel(), pattern.ravel())[0, 1] if pattern.std() else 0.0
+        for master, pattern in zip(masters, patterns)
+    ]
+    scores = ncc_scores([master_stats(master) for master in masters], patterns)
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9)
@@ -0,0 +1,160 @@
+import io
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # backend.main reads QR codes with zbar
+
+from backend import main
+from generator.qr_render import encode_png, render_secure_qr
+
+pytestmark = pytest.mark.usefixtures("fresh_registration_lock")
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def register_label(client, stable_unique_ids):
+    """Registers a product and returns (unique_id, its printed label as PNG bytes)."""
+
+    def register():
+        unique_id = client.post("/products/", json={"product_name": "Test", "company_name": "Test"}).json()["unique_id"]
+        png = client.get(f"/products/{unique_id}/master_pattern").content
+        pattern = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+        return unique_id, encode_png(render_secure_qr(unique_id, pattern))
+
+    return register
+
+
+def forged_label(unique_id):
+    """A label carrying a real code but a made-up pattern."""
+    pattern = np.random.default_rng(0).integers(0, 256, (48, 48), dtype=np.uint8)
+    return encode_png(render_secure_qr(unique_id, pattern))
+
+
+def zip_of(*images):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i, image in enumerate(images):
+            archive.writestr(f"{i}.png", image)
+    return buffer.getvalue()
+
+
+def test_empty_upload_is_rejected_as_unreadable(client):
+    response = client.post("/verify/image", files={"file": ("empty.jpg", b"")})
+    assert response.status_code == 400
+
+
+def test_batch_results_follow_input_order_across_zips_and_files(client, register_label):
+    first_id, first = register_label()
+    second_id, second = register_label()
+    files = [
+        ("files", ("first.png", first, "image/png")),
+        ("files", ("labels.zip", zip_of(second, forged_label(first_id)), "application/zip")),
+        ("files", ("junk.png", b"not an image", "image/png")),
+    ]
+    response = client.post("/verify/batch", files=files)
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == ["AUTHENTIC", "AUTHENTIC", "COUNTERFEIT", "UNABLE_TO_VERIFY"]
+    assert [(result["product_data"] or {}).get("unique_id") for result in results] == [first_id, second_id, first_id, None]
+
+
+def test_batch_zip_entries_are_counted_before_unpacking(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_VERIFY_BATCH_SIZE", 2)
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda *args: pytest.fail("Unpacked an oversized batch"))
+    files = [
+        ("files", ("single.png", b"x", "image/png")),
+        ("files", ("labels.zip", zip_of(b"x", b"x"), "application/zip")),
+    ]
+    response = client.post("/verify/batch", files=files)
+    assert response.status_code == 422
+
+
+def test_empty_live_frame_is_skipped(client):
+    with client.websocket_connect("/verify/live") as websocket:
+        websocket.send_bytes(b"")
+        update = websocket.receive_json()
+    assert update["status"] == "SCANNING"
+    assert update["frames"] == 1
+
+
+def test_live_verdict_comes_early_once_enough_frames_match(client, register_label):
+    unique_id, label = register_label()
+    with client.websocket_connect("/verify/live") as websocket:
+        updates = []
+        for _ in range(main.LIVE_TOP_FRAMES):
+            websocket.send_bytes(label)
+            updates.append(websocket.receive_json())
+    assert [update["status"] for update in updates[:-1]] == ["SCANNING"] * (main.LIVE_TOP_FRAMES - 1)
+    verdict = updates[-1]
+    assert verdict["status"] == "AUTHENTIC"
+    assert verdict["frames"] == main.LIVE_TOP_FRAMES
+    assert verdict["product_data"]["unique_id"] == unique_id
+
+
+def test_live_frames_of_a_different_code_are_ignored(client, register_label, monkeypatch):
+    monkeypatch.setattr(main, "LIVE_TOP_FRAMES", 2)
+    unique_id, label = register_label()
+    _, other_label = register_label()
+    with client.websocket_connect("/verify/live") as websocket:
+        updates = []
+        for frame in (label, other_label, label):
+            websocket.send_bytes(frame)
+            updates.append(websocket.receive_json())
+    assert updates[1]["status"] == "SCANNING"
+    assert updates[1]["message"] == "A different code came into view; frame ignored."
+    assert updates[2]["status"] == "AUTHENTIC"
+    assert updates[2]["frames"] == 3
+    assert updates[2]["product_data"]["unique_id"] == unique_id
+
+
+def test_live_session_decides_on_what_it_saw_after_the_last_frame(client, register_label, monkeypatch):
+    monkeypatch.setattr(main, "LIVE_MAX_FRAMES", 3)
+    unique_id, _ = register_label()
+    with client.websocket_connect("/verify/live") as websocket:
+        for _ in range(3):
+            websocket.send_bytes(forged_label(unique_id))
+            assert websocket.receive_json()["status"] == "SCANNING"
+        verdict = websocket.receive_json()
+    assert verdict["status"] == "COUNTERFEIT"
+    assert verdict["frames"] == 3
+    assert verdict["similarity_score"] < main.AUTHENTICITY_THRESHOLD
+
+
+def test_live_session_decides_when_frames_stop_coming(client, register_label, monkeypatch):
+    monkeypatch.setattr(main, "LIVE_FRAME_TIMEOUT", 0.2)
+    unique_id, label = register_label()
+    with client.websocket_connect("/verify/live") as websocket:
+        websocket.send_bytes(label)
+        assert websocket.receive_json()["status"] == "SCANNING"
+        verdict = websocket.receive_json()
+    assert verdict["status"] == "AUTHENTIC"
+    assert verdict["frames"] == 1
+    assert verdict["product_data"]["unique_id"] == unique_id
+
+
+def test_live_session_without_a_readable_code_is_unable_to_verify(client, monkeypatch):
+    monkeypatch.setattr(main, "LIVE_FRAME_TIMEOUT", 0.2)
+    with client.websocket_connect("/verify/live") as websocket:
+        verdict = websocket.receive_json()
+    assert verdict["status"] == "UNABLE_TO_VERIFY"
+    assert verdict["frames"] == 0
+
+
+def test_oversized_live_frame_is_skipped(client, monkeypatch):
+    monkeypatch.setattr(main, "LIVE_MAX_FRAME_BYTES", 10)
+    with client.websocket_connect("/verify/live") as websocket:
+        websocket.send_bytes(b"x" * 11)
+        update = websocket.receive_json()
+    assert update["status"] == "SCANNING"
+    assert update["message"].startswith("Frames must be under 10 bytes")
+    assert update["frames"] == 1
+    assert update["confidence"] is None
@@ -0,0 +1,26 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # Workers warm up the zbar pipeline
+
+from backend.workers import PoolSaturated, VerificationPool
+
+
+@pytest.mark.parametrize("run_many", [False, True])
+def test_process_pool_recovers_after_a_worker_dies(run_many):
+    async def crash_then_run():
+        pool = VerificationPool("process", workers=1, queue_size=1)
+        await pool.start()
+        try:
+            with pytest.raises(PoolSaturated):
+                if run_many:
+                    await pool.run_many(os._exit, [1, 1])
+                else:
+                    await pool.run(os._exit, 1)
+            return await pool.run(abs, -3), await pool.run_many(abs, [-1, -2])
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(crash_then_run()) == (3, [1, 2])
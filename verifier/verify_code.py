@@ -1,8 +1,30 @@
 import requests
 import argparse
+import concurrent.futures
+import glob
+import mimetypes
+import os
+import time
+from typing import Optional
+import cv2
+import numpy as np
+from requests.adapters import HTTPAdapter
 
 API_URL = "http://127.0.0.1:8000"
 
+# --- BULK MODE ---
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+DETECT_MAX_SIDE = 1024  # The QR is located on a copy downscaled to this size
+# Close-ups are downscaled until the QR is at most this wide, about eight photo
+# pixels per pattern pixel (labels print it at 290px). Downscaling further
+# costs similarity score: on test photos, 0.03 at 1600px and 0.06 at 1200px.
+# Most of the saving comes from the crop.
+MAX_SYMBOL_SIDE = 2400
+JPEG_QUALITY = 95  # For re-encoding photos that arrived as JPEG
+CROP_MARGIN = 0.25  # Kept around the QR on each side, as a fraction of its width
+MAX_RETRIES = 3  # Attempts after a 503 from a saturated server
+STATUSES = ("AUTHENTIC", "COUNTERFEIT", "UNABLE_TO_VERIFY", "ERROR")
+
 def verify_qr_code_image(image_path: str):
     """
     Sends a QR code image to the backend for full verification (Phase 2).
@@ -37,9 +59,138 @@ def verify_qr_code_image(image_path: str):
     except Exception as e:
         print(f"\n[ERROR] An unexpected error occurred: {e}")
 
+
+def collect_images(target: str) -> list:
+    """Lists the images in a directory (recursively) or matching a glob pattern."""
+    if os.path.isdir(target):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(target) for name in names]
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+
+
+def prepare_upload(image_data: bytes, max_side: int = MAX_SYMBOL_SIDE) -> bytes:
+    """
+    Crops the image to the QR code plus a margin and downscales it, so a
+    multi-megabyte photo uploads as a much smaller grayscale image. JPEG
+    photos are re-encoded as JPEG and everything else as lossless PNG. The
+    server finds the code itself, so if it cannot be located here the
+    original is sent.
+    """
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return image_data  # Let the server report what is wrong with it
+
+    scale = min(1.0, DETECT_MAX_SIDE / max(image.shape))
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+    found, points = cv2.QRCodeDetector().detect(small)
+    if not found:
+        return image_data
+    corners = points.reshape(-1, 2) / scale
+
+    side = max(np.linalg.norm(corners - np.roll(corners, 1, axis=0), axis=1))
+    margin = side * CROP_MARGIN
+    x0, y0 = np.maximum(np.floor(corners.min(axis=0) - margin), 0).astype(int)
+    x1, y1 = np.ceil(corners.max(axis=0) + margin).astype(int)
+    crop = image[y0:y1, x0:x1]
+    if side > max_side:
+        shrink = max_side / side
+        crop = cv2.resize(crop, None, fx=shrink, fy=shrink, interpolation=cv2.INTER_AREA)
+
+    if image_data.startswith(b"\xff\xd8"):
+        ok, encoded = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    else:
+        ok, encoded = cv2.imencode(".png", crop, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+    return encoded.tobytes() if ok and encoded.nbytes < len(image_data) else image_data
+
+
+def verify_one(session: requests.Session, image_path: str, max_side: Optional[int]) -> dict:
+    """Verifies one image and returns its status, score, upload size and latency. max_side=None uploads it as is."""
+    result = {"path": image_path, "status": "ERROR", "score": None, "detail": None}
+    try:
+        with open(image_path, "rb") as f:
+            image_data = f.read()
+        result["original_bytes"] = len(image_data)
+        upload = prepare_upload(image_data, max_side) if max_side else image_data
+        result["upload_bytes"] = len(upload)
+        filename = os.path.basename(image_path)
+        if upload is not image_data:
+            filename = os.path.splitext(filename)[0] + (".jpg" if upload.startswith(b"\xff\xd8") else ".png")
+        content_type = mimetypes.guess_type(filename)[0]
+
+        start = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            response = session.post(f"{API_URL}/verify/image", files={"file": (filename, upload, content_type)})
+            if response.status_code != 503 or attempt == MAX_RETRIES:
+                break
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+        result["latency"] = time.perf_counter() - start
+
+        if response.status_code == 400:
+            # The server could not find or decode a QR code in the image
+            result.update(status="UNABLE_TO_VERIFY", detail=response.json().get("detail"))
+        else:
+            response.raise_for_status()
+            data = response.json()
+            result.update(status=data["status"], score=data.get("similarity_score"), detail=data["message"])
+    except Exception as e:
+        result["detail"] = str(e)
+    return result
+
+
+def verify_bulk(target: str, concurrency: int, max_side: Optional[int]):
+    """Verifies every image in a directory or glob concurrently and prints a summary report."""
+    paths = collect_images(target)
+    if not paths:
+        print(f"[ERROR] No images found at: {target}")
+        return
+    print(f"--- Verifying {len(paths)} images with {concurrency} concurrent uploads ---")
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    results = []
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(verify_one, session, path, max_side) for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            score = f" (score {result['score']:.4f})" if result["score"] is not None else ""
+            detail = f": {result['detail']}" if result["status"] in ("UNABLE_TO_VERIFY", "ERROR") else ""
+            print(f"[{result['status']}] {result['path']}{score}{detail}")
+    elapsed = time.perf_counter() - start
+
+    counts = {status: 0 for status in STATUSES}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    latencies = np.array([r["latency"] for r in results if "latency" in r]) * 1000
+    original = sum(r.get("original_bytes", 0) for r in results)
+    uploaded = sum(r.get("upload_bytes", 0) for r in results)
+
+    print("\n--- SUMMARY ---")
+    for status, count in counts.items():
+        print(f"{status + ':':<18} {count}")
+    if latencies.size:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"Latency:           p50 {p50:.0f} ms, p95 {p95:.0f} ms")
+    print(f"Throughput:        {len(results) / elapsed:.1f} images/s ({elapsed:.1f} s total)")
+    if original:
+        print(f"Uploaded:          {uploaded / 1e6:.1f} MB of {original / 1e6:.1f} MB read")
+    print("---------------")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Verify a product's secure QR code image.")
-    parser.add_argument("image_path", type=str, help="The path to the secure QR code image file.")
+    parser.add_argument("image_path", type=str, help="The path to the secure QR code image file, or a directory or glob of them.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads when verifying many images.")
+    parser.add_argument("--max-qr-side", type=int, default=MAX_SYMBOL_SIDE, help="Downscale uploads until the QR code is at most this many pixels wide.")
+    parser.add_argument("--no-preprocess", action="store_true", help="Upload images as they are, without cropping to the QR code.")
     args = parser.parse_args()
-    
-    verify_qr_code_image(args.image_path)
\ No newline at end of file
+
+    if os.path.isdir(args.image_path) or any(c in args.image_path for c in "*?["):
+        verify_bulk(args.image_path, args.concurrency, None if args.no_preprocess else args.max_qr_side)
+    else:
+        verify_qr_code_image(args.image_path)
\ No newline at end of file
@@ -1,8 +1,9 @@
 import qrcode
 import numpy as np
-from PIL import Image
 import os
 
+from generator.qr_render import qr_modules, render_modules, render_secure_qr, save_png
+
 # --- Configuration ---
 DATA_TO_ENCODE = "https://mybrand.com/product/12345-abcde"
 PATTERN_SIZE = 48  # The width and height of our security pattern in pixels
@@ -11,16 +12,9 @@ OUTPUT_DIR = "before_and_after"
 def generate_standard_qr(data, filepath):
     """Generates a plain, standard QR code."""
     print("1. Generating the 'Before' image: A standard QR code...")
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L, # Standard, low error correction
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    img.save(filepath)
+    # Standard, low error correction
+    modules = qr_modules(data, version=1, error_correction=qrcode.constants.ERROR_CORRECT_L)
+    save_png(render_modules(modules), filepath)
     print(f"   -> Saved to {filepath}\n")
 
 def generate_secure_qr(data, filepath):
@@ -30,38 +24,18 @@ def generate_secure_qr(data, filepath):
     # --- Step A: Create the random, high-entropy copy detection pattern ---
     # We use numpy to create a grid of random grayscale pixel values (0-255)
     pattern_array = np.random.randint(0, 256, (PATTERN_SIZE, PATTERN_SIZE), dtype=np.uint8)
-    pattern_img = Image.fromarray(pattern_array, mode='L') # 'L' mode is for grayscale
     print("   -> Created a random grayscale security pattern.")
 
-    # --- Step B: Create a base QR code with HIGH error correction ---
-    # This is the critical step. ERROR_CORRECT_H makes space for our pattern.
-    qr = qrcode.QRCode(
-        version=3, # A slightly larger version to ensure enough space
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    # Generate the QR as a Pillow Image object so we can manipulate it
-    qr_img = qr.make_image(fill_color="black", back_color="white").convert('RGB')
+    # --- Step B: Render the QR code with HIGH error correction and embed the pattern ---
+    # ERROR_CORRECT_H is the critical part: it makes space for our pattern.
+    # The QR is rendered straight into a grayscale array and the pattern is
+    # written into its center, without building an RGB image and pasting.
+    qr_img = render_secure_qr(data, pattern_array)
     print("   -> Generated a base QR code with High (H) error correction.")
+    print("   -> Embedded the security pattern in the center of the QR code.")
 
-    # --- Step C: Paste the pattern into the center of the QR code ---
-    qr_width, qr_height = qr_img.size
-    pattern_width, pattern_height = pattern_img.size
-    
-    # Calculate the top-left position to paste the pattern for centering
-    position = (
-        (qr_width - pattern_width) // 2,
-        (qr_height - pattern_height) // 2
-    )
-    
-    qr_img.paste(pattern_img, position)
-    print("   -> Pasted the security pattern onto the center of the QR code.")
-
-    # --- Step D: Save the final, composite image ---
-    qr_img.save(filepath)
+    # --- Step C: Save the final, composite image ---
+    save_png(qr_img, filepath)
     print(f"   -> Saved final secure image to {filepath}\n")
 
 